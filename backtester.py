@@ -3,16 +3,18 @@ from trader_r5_mm import Trader
 
 
 from datamodel import *
-from typing import Any
+from compact_datamodel import Order, Trade, TradingState, to_json
+from market_data import PriceColumns, TradeColumns, load_prices, load_trades, stream_states
+import market_store
+from engine_stats import EngineStats
+from typing import Any, Tuple
 import pandas as pd
-import numpy as np
 import statistics
-import copy
 import uuid
 import json
+import contextlib
 
 import sys
-sys.stdout = open('./backtest_logs/backtest.log','wt')
 
 round = 4
 day = 4
@@ -23,65 +25,50 @@ TIME_DELTA = 100
 # Please put all! the price and log files into
 # the same directory or adjust the code accordingly
 
-def process_prices(df_prices, time_limit) -> dict[int, TradingState]:
-    states = {}
-    for _, row in df_prices.iterrows():
-        time: int = int(row["timestamp"])
-        if time > time_limit:
-            break
-        product: str = row["product"]
-        if states.get(time) == None:
-            position: Dict[Product, Position] = {}
-            own_trades: Dict[Symbol, List[Trade]] = {}
-            market_trades: Dict[Symbol, List[Trade]] = {}
-            observations: Dict[Product, Observation] = {}
-            listings = {}
-            depths = {}
-            states[time] = TradingState(time, listings, depths, own_trades, market_trades, position, observations)
-
-        states[time].listings[product] = Listing(product, product, product)
-        if np.isnan(row["bid_price_1"]):
-            states[time].observations[product] = row["mid_price"]
-            continue
-        depth = OrderDepth()
-        if row["bid_price_1"]> 0:
-            depth.buy_orders[row["bid_price_1"]] = int(row["bid_volume_1"])
-        if row["bid_price_2"]> 0:
-            depth.buy_orders[row["bid_price_2"]] = int(row["bid_volume_2"])
-        if row["bid_price_3"]> 0:
-            depth.buy_orders[row["bid_price_3"]] = int(row["bid_volume_3"])
-        if row["ask_price_1"]> 0:
-            depth.sell_orders[row["ask_price_1"]] = int(row["ask_volume_1"])
-        if row["ask_price_2"]> 0:
-            depth.sell_orders[row["ask_price_2"]] = int(row["ask_volume_2"])
-        if row["ask_price_3"]> 0:
-            depth.sell_orders[row["ask_price_3"]] = int(row["ask_volume_3"])
-        
-        states[time].order_depths[product] = depth
-
-        if product not in states[time].position:
-            states[time].position[product] = 0
-            states[time].own_trades[product] = []
-            states[time].market_trades[product] = []
-    return states
-
-def process_trades(df_trades, states: dict[int, TradingState], time_limit):
-    for _, trade in df_trades.iterrows():
-        time: int = trade['timestamp']
-        if time > time_limit:
-            break
-        symbol = trade['symbol']
-        if symbol not in states[time].market_trades:
-            states[time].market_trades[symbol] = []
-        t = Trade(
-                symbol, 
-                trade['price'], 
-                trade['quantity'], 
-                trade['buyer'], #, 
-                trade['seller'], 
-                time)
-        states[time].market_trades[symbol].append(t)
-       
+class LazyStates(dict):
+    """ dict[int, TradingState] that builds each state from the price columns on first access
+    """
+    def __init__(self, prices: PriceColumns):
+        super().__init__()
+        self.prices = prices
+        self.trades: TradeColumns = None
+        self.trade_groups = None
+
+    def set_trades(self, trades: TradeColumns):
+        self.trades = trades
+        self.trade_groups = trades.tick_groups(self.prices.timestamps)
+
+    def __missing__(self, time: int) -> TradingState:
+        i = self.prices.index_of(time)
+        if i < 0:
+            raise KeyError(time)
+        state = self.prices.state(i)
+        if self.trades is not None:
+            starts, ends = self.trade_groups
+            self.trades.add_market_trades(state.market_trades, int(starts[i]), int(ends[i]))
+        self[time] = state
+        return state
+
+    def get(self, time: int, default=None):
+        try:
+            return self[time]
+        except KeyError:
+            return default
+
+    def items(self):
+        # Every tick in time order, not only the ones built so far
+        return ((time, self[time]) for time in self.timestamps())
+
+    def timestamps(self) -> List[int]:
+        return self.prices.timestamps.tolist()
+
+def process_prices(df_prices, time_limit) -> LazyStates:
+    return LazyStates(load_prices(df_prices, time_limit))
+
+def process_trades(df_trades, states: LazyStates, time_limit):
+    # Trades at timestamps missing from the price file have no state and are dropped
+    states.set_trades(load_trades(df_trades, time_limit))
+
 current_limits = {
     'PEARLS': 20,
     'BANANAS': 20,
@@ -95,62 +82,143 @@ current_limits = {
     "PICNIC_BASKET": 70,
 }
 
-# Setting a high time_limit can be harder to visualize
-def simulate_alternative(round: int, day: int, trader, time_limit=999900):
-    prices_path = f"{TRAINING_DATA_PREFIX}/prices_round_{round}_day_{day}.csv"
-    trades_path = f"{TRAINING_DATA_PREFIX}/trades_round_{round}_day_{day}_wn.csv"
+def load_day(round: int, day: int, time_limit=999900, data_dir=None, stats: EngineStats = None):
+    # Without an explicit data_dir use the memory mapped store if market_store.py has converted this day
+    if data_dir is None and market_store.has_day(round, day):
+        if stats:
+            return stats.timed('load_store', market_store.load_day)(round, day, "wn", time_limit)
+        return market_store.load_day(round, day, "wn", time_limit)
+    data_dir = data_dir or TRAINING_DATA_PREFIX
+    prices_path = f"{data_dir}/prices_round_{round}_day_{day}.csv"
+    trades_path = f"{data_dir}/trades_round_{round}_day_{day}_wn.csv"
+    if stats:
+        mark = stats.start()
     df_prices = pd.read_csv(prices_path, sep=';')
     try:
         df_trades = pd.read_csv(trades_path, sep=';')
     except FileNotFoundError:
         df_trades = pd.DataFrame()
-    states = process_prices(df_prices, time_limit)
-    process_trades(df_trades, states, time_limit)
-    position = copy.copy(states[0].position)
-    for time, state in states.items():
-        position = copy.copy(state.position)
-        orders = trader.run(copy.copy(state))
-        trades = clear_order_book(orders, state.order_depths, time, state.market_trades)
-        grouped_by_symbol = {}
+    if stats:
+        stats.stop('read_csv', mark)
+        mark = stats.start()
+    columns = load_prices(df_prices, time_limit), load_trades(df_trades, time_limit)
+    if stats:
+        stats.stop('load_columns', mark)
+    return columns
 
-        if len(trades) > 0:
-            for trade in trades:
-                if grouped_by_symbol.get(trade.symbol) == None:
-                    grouped_by_symbol[trade.symbol] = []
-                n_position = position[trade.symbol] + trade.quantity 
-                if abs(n_position) > current_limits[trade.symbol]:
-                    print("ILLEGAL TRADE, WOULD EXCEED POSITION LIMIT, KILLING ALL REMAINING ORDERS")
-                    print(json.dumps(trades,default=lambda o: o.__dict__, sort_keys=True))
-                #     break
-                position[trade.symbol] = n_position
-                trade.quantity = abs(trade.quantity)
-                grouped_by_symbol[trade.symbol].append(trade)
-                
-        if states.get(time + TIME_DELTA) != None:
-            states[time + TIME_DELTA].position = position
-            if grouped_by_symbol:
-                states[time + TIME_DELTA].own_trades = grouped_by_symbol
+# Setting a high time_limit can be harder to visualize
+def simulate_alternative(round: int, day: int, trader, time_limit=999900, data_dir=None, stats: EngineStats = None, touch_fills=False, step=1) -> dict:
+    """ Replay one day through the trader and return its summary (see summarize_day),
+    stage timings are added to stats if one is given, touch_fills also fills resting orders
+    at and behind the touch from market trades (see TouchQueue) and step > 1 replays every
+    step-th tick (see simulate_columns)
+    """
+    if stats:
+        mark = stats.start()
+    prices, market_trades = load_day(round, day, time_limit, data_dir, stats)
+    with contextlib.redirect_stdout(stats.timed_stream('log_write', sys.stdout)) if stats else contextlib.nullcontext():
+        summary = simulate_columns(round, day, trader, prices, market_trades, stats, touch_fills, step)
+    if stats:
+        stats.stop('day', mark)
+    return summary
+
+def simulate_columns(round: int, day: int, trader, prices: PriceColumns, market_trades: TradeColumns, stats: EngineStats = None, touch_fills=False, step=1) -> dict:
+    """ Replay already parsed columns through the trader, they are not modified so can be reused
+
+    States are streamed one tick at a time from the parsed columns and dropped after
+    the trader has seen them. The engine keeps its own position dict and every state gets
+    a plain dict snapshot of it, so the trader may copy, pickle or modify what it is given.
+
+    The clock is the sorted timestamps of the file, position and own trades are handed to
+    the next tick whatever the gap to it. With step > 1 only every step-th tick is replayed
+    (about step times faster), the market trades of skipped ticks arrive with the next
+    replayed one. That is a coarse approximation: the trader quotes and fills step times
+    less often, indicators counted in ticks (EMAs, windows) span step times longer, and
+    book crossing opportunities on skipped ticks are missed, so use it to rank parameters
+    and confirm the best ones at step 1.
+    """
+    position = {}
+    own_trades = None
+    cash, fills, volume = {}, {}, {}
+    states = stream_states(prices, market_trades, step)
+    run, clear = trader.run, clear_order_book
+    queue = TouchQueue() if touch_fills else None
+    if stats:
+        # Only wrapped when measuring, a normal run calls the plain functions
+        states = stats.timed_iter('build_state', states)
+        run, clear = stats.timed('trader_run', run), stats.timed('clear_order_book', clear)
+    for state in states:
+        time = state.timestamp
+        if own_trades is None:
+            position.update(state.position)
+        else:
+            state.own_trades = dict(own_trades)
+            if not position.keys() >= state.position.keys():
+                # Products first listed after the opening tick start flat
+                for product in state.position.keys() - position.keys():
+                    position[product] = 0
+        state.position = dict(position)
+        own_trades = state.own_trades
+        order_depths, tick_market_trades = state.order_depths, state.market_trades
+
+        orders = run(state)
+        trades = clear(orders, order_depths, time, tick_market_trades, queue)
+        if not trades:
+            continue
+
+        if stats:
+            mark = stats.start()
+        grouped_by_symbol = {}
+        for trade in trades:
+            symbol, qty = trade.symbol, trade.quantity
+            n_position = position[symbol] + qty
+            if abs(n_position) > current_limits[symbol]:
+                print("ILLEGAL TRADE, WOULD EXCEED POSITION LIMIT, KILLING ALL REMAINING ORDERS")
+                print(to_json(trades))
+            #     break
+            position[symbol] = n_position
+            cash[symbol] = cash.get(symbol, 0) - trade.price*qty
+            fills[symbol] = fills.get(symbol, 0) + 1
+            volume[symbol] = volume.get(symbol, 0) + abs(qty)
+            # Own trades are reported with positive quantities like the exchange
+            trade.quantity = abs(qty)
+            if symbol in grouped_by_symbol:
+                grouped_by_symbol[symbol].append(trade)
             else:
-                states[time + TIME_DELTA].own_trades = state.own_trades
-    # create_log_file(states, day, trader)
-
-def cleanup_order_volumes(org_orders: List[Order]) -> List[Order]:
-    buy_orders, sell_orders = [], []
-
-    for i in range(len(org_orders)):
-        order_1 = org_orders[i]
-        final_order = copy.copy(order_1)
-        for j in range(i+1, len(org_orders)):
-            order_2 = org_orders[j]
-            if order_1 == order_2:
-               continue 
-            if order_1.price == order_2.price and order_2.quantity != 0:
-                final_order.quantity += order_2.quantity
-                order_2.quantity = 0
-        if final_order.quantity < 0:
-            sell_orders.append(final_order)
-        elif final_order.quantity > 0:
-            buy_orders.append(final_order)
+                grouped_by_symbol[symbol] = [trade]
+        own_trades = grouped_by_symbol
+        if stats:
+            stats.stop('fills', mark)
+    # create_log_file(LazyStates(prices), day, trader)
+    return summarize_day(round, day, position, cash, fills, volume, prices.last_mid_prices())
+
+def summarize_day(round: int, day: int, position, cash, fills, volume, mids) -> dict:
+    """ Per symbol end of day position, fills, traded volume and PnL marked at the last mid
+    """
+    symbols = sorted(set(position) | set(cash))
+    pnl = {sym: cash.get(sym, 0) + position.get(sym, 0)*mids.get(sym, 0) for sym in symbols}
+    return {
+        'round': round,
+        'day': day,
+        'pnl': pnl,
+        'position': {sym: position.get(sym, 0) for sym in symbols},
+        'fills': {sym: fills.get(sym, 0) for sym in symbols},
+        'volume': {sym: volume.get(sym, 0) for sym in symbols},
+    }
+
+def cleanup_order_volumes(org_orders: List[Order]) -> Tuple[List[Order], List[Order]]:
+    """ Net the trader's orders by price in one pass, the trader's Order objects are not modified
+
+    Returns new buy and sell orders, each ladder sorted most aggressive first.
+    """
+    volumes: Dict[int, int] = {}
+    for order in org_orders:
+        volumes[order.price] = volumes.get(order.price, 0) + order.quantity
+    if not volumes:
+        return [], []
+    symbol = org_orders[0].symbol
+    buy_orders = [Order(symbol, price, qty) for price, qty in volumes.items() if qty > 0]
+    sell_orders = [Order(symbol, price, qty) for price, qty in volumes.items() if qty < 0]
     buy_orders.sort(key=lambda x: x.price, reverse=True) # order by most aggressive
     sell_orders.sort(key=lambda x: x.price) # order by most aggressive
     return buy_orders, sell_orders
@@ -168,77 +236,200 @@ def get_bids_asks(order_depth):
         return [], [], [], []
     return bids, asks, bid_sizes, ask_sizes
 
-def clear_order_book(trader_orders: dict[str, List[Order]], order_depth: dict[str, OrderDepth], time: int, market_trades) -> list[Trade]:
-    trades = []
-    for symbol in trader_orders.keys():
-        if order_depth.get(symbol) != None:
-            bids, asks, bid_sizes, ask_sizes = get_bids_asks(order_depth[symbol])
-            best_bid = bids[0]
-            best_ask = asks[0]
-            buy_orders, sell_orders = cleanup_order_volumes(trader_orders[symbol])
-            for order in buy_orders:
-                while order.quantity > 0 and len(asks) > 0 and order.price >= asks[0]:
-                    trade_sz = min(ask_sizes[0], order.quantity)
-                    trades.append(Trade(symbol, asks[0], trade_sz, "Submission", "Unknown", time))
-                    order.quantity -= trade_sz
-                    ask_sizes[0] -= trade_sz
-                    if ask_sizes[0] == 0:
-                        asks.pop(0)
-                        ask_sizes.pop(0)
-
-            for order in sell_orders:
-                while order.quantity < 0 and len(bids) > 0 and order.price <= bids[0]:
-                    trade_sz = min(bid_sizes[0], abs(order.quantity))
-                    trades.append(Trade(symbol, bids[0], -trade_sz, "Unknown", "Submission", time))
-                    order.quantity += trade_sz # position inc
-                    bid_sizes[0] -= trade_sz
-                    if bid_sizes[0] == 0:
-                        bids.pop(0)
-                        bid_sizes.pop(0)
-            m_trades = market_trades[symbol]
-            m_trades.sort(key=lambda x: x.price)
-
-            new_bid = bids[0] if len(bids) > 0 else best_bid
-            new_ask = asks[0] if len(asks) > 0 else best_ask
-            for t in m_trades:
-                # Try to match market trades with orders that are still in the book
-                if (t.price - best_bid) < (best_ask - t.price):
-                    # Trade closer to bid, assume person is trying to sell
-                    for order in buy_orders:
-                        if order.quantity == 0:
-                            continue
-                        if order.price <= best_bid:
-                            # Don't have queue priority
-                            break
-                        if order.price >= t.price:
-                            trade_sz = min(order.quantity, t.quantity)
-                            order.quantity -= trade_sz
-                            t.quantity -= trade_sz
+def get_sorted_levels(order_depth):
+    """ get_bids_asks without the sort when the book dicts are already in price priority
+    order, SortedOrderDepth books from market_data are only copied
+    """
+    if len(order_depth.buy_orders) == 0 or len(order_depth.sell_orders) == 0:
+        return [], [], [], []
+    if isinstance(order_depth, SortedOrderDepth):
+        return list(order_depth.bid_prices), list(order_depth.ask_prices), list(order_depth.bid_sizes), list(order_depth.ask_sizes)
+    bids = list(order_depth.buy_orders)
+    for i in range(1, len(bids)):
+        if bids[i-1] < bids[i]:
+            bids.sort(reverse=True)
+            break
+    asks = list(order_depth.sell_orders)
+    for i in range(1, len(asks)):
+        if asks[i-1] > asks[i]:
+            asks.sort()
+            break
+    bid_sizes = [order_depth.buy_orders[bid] for bid in bids]
+    ask_sizes = [abs(order_depth.sell_orders[ask]) for ask in asks]
+    return bids, asks, bid_sizes, ask_sizes
+
+class TouchQueue:
+    """ Fills behind the touch, an add-on to the inside the spread rule that lets resting orders
+    at or behind the best price trade with market trades once the displayed volume ahead is gone
+
+    Our side of the book is walked in price priority: at every price the displayed volume ahead
+    of our order, then our order, then the displayed volume behind it. A resting order joins the
+    back of its price level (nothing ahead if it improves the book). While it is re-posted at the
+    same price on consecutive ticks it keeps its place, moving up when the level shrinks below the
+    volume ahead of it. Market trades initiated by the other side are taken nearest price first
+    and use up everything in front of an order, better prices included, before filling it, so
+    trades through its price fill it only once the queue ahead is gone. Work is
+    O(levels + resting prices + market trades) per symbol and tick.
+
+    Orders that improve the book have nothing in front of them and fill as with the default rule,
+    only taking the trades nearest their price first. It adds fills and never removes any: there
+    is no telling who else joined an improved price first, so fills inside the spread are as
+    optimistic as without it.
+    """
+    def __init__(self):
+        # (symbol, side) -> (time, {price: volume ahead})
+        self.ahead: Dict[Tuple[str, int], Tuple[int, Dict[int, int]]] = {}
+        self.time = None
+        self.previous = None
+
+    def advance(self, time: int):
+        """ Move the clock to the tick being cleared, queue places only carry over from the tick before
+        """
+        if time != self.time:
+            self.previous, self.time = self.time, time
+
+    def match(self, symbol: str, time: int, orders: List[Order], sign: int, levels: Dict[int, int], m_trades: List[Trade], trades: List[Trade]):
+        """ Fill orders (one side, sign 1 for buys and -1 for sells) from market trades initiated by
+        the other side, levels are the displayed sizes on our side
+        """
+        last_time, prev = self.ahead.get((symbol, sign), (None, {}))
+        if last_time != self.previous:
+            prev = {}
+        resting = {}
+        for order in orders:
+            if order.quantity != 0:
+                resting[order.price] = order
+        front, back = {}, {}
+        for price, size in levels.items():
+            front[price], back[price] = size, 0
+        for price in resting:
+            size = levels.get(price, 0)
+            front[price] = min(prev[price], size) if price in prev else size
+            back[price] = size - front[price]
+        prices = sorted(front, key=lambda px: -sign*px)
+
+        i = 0
+        for t in sorted(m_trades, key=lambda x: -sign*x.price):
+            t_qty = t.quantity
+            while t_qty > 0 and i < len(prices) and sign*(prices[i] - t.price) >= 0:
+                price = prices[i]
+                queued = min(front[price], t_qty)
+                front[price] -= queued
+                t_qty -= queued
+                order = resting.get(price)
+                if order is not None and t_qty > 0:
+                    trade_sz = min(sign*order.quantity, t_qty)
+                    if trade_sz > 0:
+                        order.quantity -= sign*trade_sz
+                        t_qty -= trade_sz
+                        if sign > 0:
                             trades.append(Trade(symbol, order.price, trade_sz, "Submission", t.seller, time))
                         else:
-                            break
-                        if t.quantity <= 0:
-                            break
-                elif (t.price - best_bid) > (best_ask - t.price):
-                    # Close to ask, assume buyer
-                    for order in sell_orders:
-                        if order.quantity == 0:
-                            continue
-                        if order.price >= best_ask:
-                            # Don't have queue priority
-                            break
-                        if order.price <= t.price:
-                            # order quantity is negative because of backtest setup
-                            trade_sz = min(-order.quantity, t.quantity)
-                            order.quantity += trade_sz
-                            t.quantity -= trade_sz
-                            # negative cuz sell
                             trades.append(Trade(symbol, order.price, -trade_sz, t.buyer, "Submission", time))
-                        else:
-                            # no more matches
-                            break
-                        if t.quantity <= 0:
-                            break
+                queued = min(back[price], t_qty)
+                back[price] -= queued
+                t_qty -= queued
+                if t_qty > 0:
+                    # Level used up, the rest of the trade goes deeper
+                    i += 1
+        # A filled order gives up its place, the next one at that price joins at the back
+        self.ahead[(symbol, sign)] = (time, {price: front[price] for price, order in resting.items() if order.quantity != 0})
+
+def clear_order_book(trader_orders: dict[str, List[Order]], order_depth: dict[str, OrderDepth], time: int, market_trades, queue: TouchQueue = None) -> list[Trade]:
+    """ Match the trader's orders against the book, then resting orders against market trades
+
+    The book is walked with a cursor per side instead of popping levels, market trades are
+    neither sorted in place nor have their quantity changed. With a queue, resting orders are
+    filled by TouchQueue, which also fills them at and behind the touch.
+    """
+    trades = []
+    if queue is not None:
+        queue.advance(time)
+    for symbol in trader_orders.keys():
+        if order_depth.get(symbol) == None:
+            continue
+        bids, asks, bid_sizes, ask_sizes = get_sorted_levels(order_depth[symbol])
+        if not bids:
+            # One sided book, nothing to match against
+            continue
+        best_bid = bids[0]
+        best_ask = asks[0]
+        buy_orders, sell_orders = cleanup_order_volumes(trader_orders[symbol])
+
+        a, n_asks = 0, len(asks)
+        for order in buy_orders:
+            qty = order.quantity
+            while qty > 0 and a < n_asks and order.price >= asks[a]:
+                trade_sz = min(ask_sizes[a], qty)
+                trades.append(Trade(symbol, asks[a], trade_sz, "Submission", "Unknown", time))
+                qty -= trade_sz
+                ask_sizes[a] -= trade_sz
+                if ask_sizes[a] == 0:
+                    a += 1
+            order.quantity = qty
+
+        b, n_bids = 0, len(bids)
+        for order in sell_orders:
+            qty = order.quantity
+            while qty < 0 and b < n_bids and order.price <= bids[b]:
+                trade_sz = min(bid_sizes[b], -qty)
+                trades.append(Trade(symbol, bids[b], -trade_sz, "Unknown", "Submission", time))
+                qty += trade_sz # position inc
+                bid_sizes[b] -= trade_sz
+                if bid_sizes[b] == 0:
+                    b += 1
+            order.quantity = qty
+
+        if queue is not None:
+            m_trades = market_trades.get(symbol) or []
+            # Trades closer to the bid were sellers hitting bids, closer to the ask buyers lifting asks
+            sells = [t for t in m_trades if (t.price - best_bid) < (best_ask - t.price)]
+            buys = [t for t in m_trades if (t.price - best_bid) > (best_ask - t.price)]
+            queue.match(symbol, time, buy_orders, 1, dict(zip(bids, bid_sizes)), sells, trades)
+            queue.match(symbol, time, sell_orders, -1, dict(zip(asks, ask_sizes)), buys, trades)
+            continue
+
+        # Only orders inside the spread can trade with market trades, don't have queue priority otherwise
+        resting_buys = [order for order in buy_orders if order.price > best_bid]
+        resting_sells = [order for order in sell_orders if order.price < best_ask]
+        m_trades = market_trades.get(symbol)
+        if not m_trades or not (resting_buys or resting_sells):
+            continue
+
+        for t in sorted(m_trades, key=lambda x: x.price):
+            # Try to match market trades with orders that are still in the book
+            t_qty = t.quantity
+            if (t.price - best_bid) < (best_ask - t.price):
+                # Trade closer to bid, assume person is trying to sell
+                for order in resting_buys:
+                    if order.quantity == 0:
+                        continue
+                    if order.price >= t.price:
+                        trade_sz = min(order.quantity, t_qty)
+                        order.quantity -= trade_sz
+                        t_qty -= trade_sz
+                        trades.append(Trade(symbol, order.price, trade_sz, "Submission", t.seller, time))
+                    else:
+                        break
+                    if t_qty <= 0:
+                        break
+            elif (t.price - best_bid) > (best_ask - t.price):
+                # Close to ask, assume buyer
+                for order in resting_sells:
+                    if order.quantity == 0:
+                        continue
+                    if order.price <= t.price:
+                        # order quantity is negative because of backtest setup
+                        trade_sz = min(-order.quantity, t_qty)
+                        order.quantity += trade_sz
+                        t_qty -= trade_sz
+                        # negative cuz sell
+                        trades.append(Trade(symbol, order.price, -trade_sz, t.buyer, "Submission", time))
+                    else:
+                        # no more matches
+                        break
+                    if t_qty <= 0:
+                        break
 
     return trades
                             
@@ -326,6 +517,9 @@ def create_log_file(states: dict[int, TradingState], day, trader: Trader):
 
 # Adjust accordingly the round and day to your needs
 if __name__ == "__main__":
+    sys.stdout = open('./backtest_logs/backtest.log','wt')
     logger = Logger(local=True)
     trader = Trader()
-    simulate_alternative(round, day, trader, 999900)
\ No newline at end of file
+    stats = EngineStats()
+    simulate_alternative(round, day, trader, 999900, stats=stats)
+    stats.dump('./backtest_logs/engine_stats.json')
\ No newline at end of file
@@ -0,0 +1,110 @@
+from typing import Dict, List, Tuple
+
+"""
+BASKET ENGINE
+Fair value of PICNIC_BASKET against DIP, BAGUETTE and UKULELE, updated once per tick:
+    basket = BasketEngine(BASKET_COMPONENTS, BASKET_WEIGHTS)
+    if basket.update(state):
+        basket.signal                       # get_basket_signal from the mids
+        basket.executable_signal(1, 5)      # same from the prices of buying 5 baskets against the components
+The sorted levels of every book are kept between ticks and only rebuilt for the sides that
+changed, the EMA of the signal is carried in the engine. Only the standard library is used,
+submissions are a single file and traders carry a copy of BasketEngine.
+"""
+
+
+def walk_depth(prices: Tuple, sizes: Tuple, qty: int):
+    """ Average price of trading qty through the levels in order, None if the book is too thin
+    """
+    left = qty
+    notional = 0
+    for px, sz in zip(prices, sizes):
+        take = min(sz, left)
+        notional += px*take
+        left -= take
+        if left == 0:
+            return notional/qty
+    return None
+
+
+class BasketEngine:
+    """ signal = (premium + sum(weight*price))/scale, positive when the basket (negative weight)
+    is cheap against the components. premium and scale are those of get_basket_signal.
+    ema_alpha=None skips the EMA for traders that do not use it.
+    """
+    def __init__(self, symbols: List[str], weights: List[float], premium: float = 400, scale: float = 100, ema_alpha: float = 1/50):
+        self.symbols = symbols
+        self.weights = weights
+        self.premium = premium
+        self.scale = scale
+        self.ema_alpha = ema_alpha
+        # symbol -> [buy_orders, sell_orders, bids, asks, bid_sizes, ask_sizes]
+        self.books: Dict[str, list] = {}
+        self.mids = [0.0]*len(symbols)
+        self.signal = None
+        self.ema = None
+        self.prev_ema = None
+
+    def update_book(self, symbol: str, order_depth) -> bool:
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = [None, None, (), (), (), ()]
+        if getattr(order_depth, 'bid_prices', None) is not None:
+            # SortedOrderDepth from the backtester, levels are already sorted
+            book[2:] = order_depth.bid_prices, order_depth.ask_prices, order_depth.bid_sizes, order_depth.ask_sizes
+            return len(book[2]) > 0 and len(book[3]) > 0
+        buy_orders, sell_orders = order_depth.buy_orders, order_depth.sell_orders
+        if buy_orders != book[0]:
+            book[0] = dict(buy_orders)
+            book[2] = tuple(sorted(buy_orders, reverse=True))
+            book[4] = tuple(buy_orders[px] for px in book[2])
+        if sell_orders != book[1]:
+            book[1] = dict(sell_orders)
+            book[3] = tuple(sorted(sell_orders))
+            book[5] = tuple(abs(sell_orders[px]) for px in book[3])
+        return len(book[2]) > 0 and len(book[3]) > 0
+
+    def update(self, state) -> bool:
+        """ Refresh the books, signal and EMA from the state, False if a book is missing or one sided
+        """
+        for i, symbol in enumerate(self.symbols):
+            order_depth = state.order_depths.get(symbol)
+            if order_depth is None or not self.update_book(symbol, order_depth):
+                return False
+            book = self.books[symbol]
+            self.mids[i] = (book[2][0] + book[3][0])/2
+        self.signal = self.value(self.mids)
+        if self.ema_alpha is not None:
+            # EMA of the previous ticks, seeded with the first signal, like hist_data in the traders
+            self.prev_ema = self.signal if self.ema is None else self.ema
+            self.ema = self.signal*self.ema_alpha + self.prev_ema*(1 - self.ema_alpha)
+        return True
+
+    def value(self, prices: List[float]) -> float:
+        total = self.premium
+        for w, px in zip(self.weights, prices):
+            total += w*px
+        return total/self.scale
+
+    def levels(self, symbol: str):
+        """ bids, asks, bid_sizes, ask_sizes as new lists, the same as get_bids_asks
+        """
+        book = self.books[symbol]
+        return list(book[2]), list(book[3]), list(book[4]), list(book[5])
+
+    def executable_signal(self, side: int, size: int):
+        """ Signal priced at the depth needed to trade size baskets, side 1 buying the basket and
+        selling the components, -1 the other way. None if a book is too thin.
+        """
+        prices = []
+        for symbol, w in zip(self.symbols, self.weights):
+            book = self.books[symbol]
+            qty = round(abs(w)*size)
+            if -side*w > 0:
+                px = walk_depth(book[3], book[5], qty)
+            else:
+                px = walk_depth(book[2], book[4], qty)
+            if px is None:
+                return None
+            prices.append(px)
+        return self.value(prices)
@@ -0,0 +1,115 @@
+import contextlib
+import glob
+import importlib
+import multiprocessing
+import os
+import re
+import zipfile
+from typing import List, Tuple
+
+import pandas as pd
+
+import backtester
+import market_store
+
+HIST_DATA_DIR = "./hist_data"
+LOG_DIR = "./backtest_logs"
+TRADER_MODULE = "trader_r5_mm"
+
+PRICES_REGEX = re.compile(r"prices_round_(-?\d+)_day_(-?\d+)\.csv$")
+STORE_DAY_REGEX = re.compile(r"round_(-?\d+)_day_(-?\d+)$")
+
+# Every worker process runs exactly one day. Traders keep their state in module level
+# globals (hist_data), so a day must never share an interpreter with another day.
+
+
+def round_data_dir(round: int) -> str:
+    return f"{HIST_DATA_DIR}/island-data-bottle-round-{round}"
+
+
+def day_data_dir(round: int, day: int):
+    """ None when the columnar store has the day (load_day then reads the store), else the
+    extracted csv folder of the round
+    """
+    return None if market_store.has_day(round, day) else round_data_dir(round)
+
+
+def discover_days(hist_data_dir=HIST_DATA_DIR, store_dir=market_store.STORE_DIR) -> List[Tuple[int, int]]:
+    """ All (round, day) pairs that have prices in the extracted hist_data folders, the round
+    zips or the columnar store
+    """
+    names = glob.glob(f"{hist_data_dir}/island-data-bottle-round-*/prices_round_*_day_*.csv")
+    for zip_path in glob.glob(f"{hist_data_dir}/island-data-bottle-round-*.zip"):
+        with zipfile.ZipFile(zip_path) as archive:
+            names += [name for name in archive.namelist() if not name.startswith("__MACOSX")]
+    days = set()
+    for name in names:
+        match = PRICES_REGEX.search(name)
+        if match:
+            days.add((int(match.group(1)), int(match.group(2))))
+    for path in glob.glob(f"{store_dir}/round_*_day_*"):
+        match = STORE_DAY_REGEX.search(path)
+        if match and market_store.has_day(int(match.group(1)), int(match.group(2)), store_dir):
+            days.add((int(match.group(1)), int(match.group(2))))
+    return sorted(days)
+
+
+def prepare_store(days: List[Tuple[int, int]], hist_data_dir=HIST_DATA_DIR):
+    """ Convert the hist_data zips into the columnar store when one of days is neither in the
+    store nor extracted, the zips also hold the named trades of every round
+    """
+    for round, day in days:
+        if not market_store.has_day(round, day) and not os.path.exists(f"{round_data_dir(round)}/prices_round_{round}_day_{day}.csv"):
+            market_store.convert_all(hist_data_dir)
+            return
+
+
+def run_day(job) -> dict:
+    """ Worker: backtest one (round, day) with a fresh trader, logs go to its own file
+    """
+    round, day, trader_module, log_dir = job
+    os.makedirs(log_dir, exist_ok=True)
+    trader = importlib.import_module(trader_module).Trader()
+    with open(f"{log_dir}/backtest_round_{round}_day_{day}.log", "wt") as log, contextlib.redirect_stdout(log):
+        return backtester.simulate_alternative(round, day, trader, data_dir=day_data_dir(round, day))
+
+
+def merge_summaries(summaries: List[dict]) -> pd.DataFrame:
+    """ One row per (round, day, symbol) with pnl, position, fills and volume
+    """
+    rows = []
+    for summary in summaries:
+        for sym in summary['pnl']:
+            rows.append({
+                'round': summary['round'],
+                'day': summary['day'],
+                'symbol': sym,
+                'pnl': summary['pnl'][sym],
+                'position': summary['position'][sym],
+                'fills': summary['fills'][sym],
+                'volume': summary['volume'][sym],
+            })
+    report = pd.DataFrame(rows, columns=['round', 'day', 'symbol', 'pnl', 'position', 'fills', 'volume'])
+    return report.sort_values(['round', 'day', 'symbol']).reset_index(drop=True)
+
+
+def run_batch(days: List[Tuple[int, int]], trader_module=TRADER_MODULE, processes=None, log_dir=LOG_DIR) -> pd.DataFrame:
+    """ Backtest every (round, day) in its own worker process, on all cores by default
+    """
+    jobs = [(round, day, trader_module, log_dir) for round, day in days]
+    processes = min(processes or os.cpu_count(), max(len(jobs), 1))
+    # maxtasksperchild=1 gives every day a brand new process and clean trader globals
+    with multiprocessing.Pool(processes, maxtasksperchild=1) as pool:
+        summaries = list(pool.imap_unordered(run_day, jobs, chunksize=1))
+    return merge_summaries(summaries)
+
+
+if __name__ == "__main__":
+    days = discover_days()
+    prepare_store(days)
+    report = run_batch(days)
+    os.makedirs(LOG_DIR, exist_ok=True)
+    report.to_csv(f"{LOG_DIR}/batch_report.csv", index=False)
+    print(report.to_string())
+    print(report.groupby(['round', 'day'])['pnl'].sum().to_string())
+    print(f"Total PnL={report['pnl'].sum()}")
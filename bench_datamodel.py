@@ -0,0 +1,43 @@
+import sys
+import time
+import tracemalloc
+
+import datamodel
+import compact_datamodel
+
+"""
+Memory and construction time of datamodel vs compact_datamodel objects at backtest scale,
+e.g. python bench_datamodel.py 1000000
+"""
+
+PRODUCTS = ["PEARLS", "BANANAS", "COCONUTS", "PINA_COLADAS", "BERRIES", "DIVING_GEAR"]
+
+
+def build(module, n: int) -> list:
+    objects = []
+    for i in range(n):
+        symbol = PRODUCTS[i % len(PRODUCTS)]
+        objects.append(module.Trade(symbol, 10000 + i % 7, 1 + i % 5, "Submission", "Unknown", i*100))
+        objects.append(module.Order(symbol, 10000 - i % 3, -1 - i % 4))
+        objects.append(module.Listing(symbol, symbol, "SEASHELLS"))
+    return objects
+
+
+def measure(module, n: int):
+    """ Traced bytes of n trades, orders and listings, then the build time without tracing
+    """
+    tracemalloc.start()
+    objects = build(module, n)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    start = time.perf_counter()
+    build(module, n)
+    return size, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    for module in [datamodel, compact_datamodel]:
+        size, seconds = measure(module, n)
+        print(f"{module.__name__:18} {3*n} objects  {size/2**20:8.1f} MiB  {size/(3*n):6.1f} B/object  {seconds:6.2f}s")
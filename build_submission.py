@@ -0,0 +1,82 @@
+"""
+SUBMISSION BUILD
+Submissions are a single file. Shared trader code that lives in its own module here is imported
+by the traders for backtesting and inlined at build time:
+    python build_submission.py trader_r5_mm.py
+writes submissions/trader_r5_mm.py with every "from <module> import ..." of INLINE_MODULES replaced
+by the module's code. Imports of the inlined module are kept, except those of repo modules that
+the trader already defines its own copy of (to_json from compact_datamodel).
+"""
+
+import ast
+import os
+import sys
+from typing import List
+
+INLINE_MODULES = ['state_logger']
+SUBMISSION_DIR = "./submissions"
+
+
+def module_parts(path: str):
+    """ Import lines and code of a module, its docstring dropped
+    """
+    with open(path) as f:
+        source = f.read()
+    lines = source.splitlines()
+    imports, body_start = [], 0
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.append((node, '\n'.join(lines[node.lineno-1:node.end_lineno])))
+        elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+            pass
+        else:
+            break
+        body_start = node.end_lineno
+    return imports, '\n'.join(lines[body_start:]).strip('\n')
+
+
+def defined_names(source: str) -> set:
+    names = set()
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.Assign):
+            names.update(t.id for t in node.targets if isinstance(t, ast.Name))
+    return names
+
+
+def inline(trader_source: str, modules: List[str] = INLINE_MODULES) -> str:
+    trader_names = defined_names(trader_source)
+    lines = trader_source.split('\n')
+    tree = ast.parse(trader_source)
+    # Bottom up so line numbers of the earlier imports stay valid
+    for node in sorted(tree.body, key=lambda n: n.lineno, reverse=True):
+        if not (isinstance(node, ast.ImportFrom) and node.module in modules):
+            continue
+        imports, body = module_parts(f"{node.module}.py")
+        kept = []
+        for imp, text in imports:
+            if isinstance(imp, ast.ImportFrom) and os.path.exists(f"{imp.module}.py") and imp.module != 'datamodel':
+                missing = [alias.name for alias in imp.names if alias.name not in trader_names]
+                if missing:
+                    raise ValueError(f"{node.module} needs {missing} from {imp.module}, the trader has no copy")
+                continue
+            kept.append(text)
+        code = '\n'.join(kept) + f"\n\n# Inlined from {node.module}.py by build_submission.py\n" + body + '\n'
+        lines[node.lineno-1:node.end_lineno] = code.split('\n')
+    return '\n'.join(lines)
+
+
+def build(trader_path: str, out_dir=SUBMISSION_DIR) -> str:
+    with open(trader_path) as f:
+        source = inline(f.read())
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = f"{out_dir}/{os.path.basename(trader_path)}"
+    with open(out_path, 'w') as f:
+        f.write(source)
+    return out_path
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        print(build(path))
@@ -0,0 +1,106 @@
+import json
+from json.encoder import c_make_encoder, encode_basestring_ascii
+from typing import Dict, List
+
+from datamodel import Time, Symbol, Product, Position, UserId, Observation, OrderDepth
+
+"""
+SLOTTED DATAMODEL
+Drop in versions of datamodel.Listing, Order, Trade and TradingState for objects the
+backtester creates millions of. Attributes live in __slots__ (no per instance dict),
+__dict__ is a read only property with the same keys so json.dumps(default=lambda o: o.__dict__),
+ProsperityEncoder and toJSON produce exactly the same text as with datamodel classes.
+Traders keep importing datamodel, the exchange only provides that module.
+"""
+
+
+def object_dict(o):
+    return o.__dict__
+
+
+# One C encoder reused for every call, same text as json.dumps(o, default=object_dict, sort_keys=True)
+json_encoder = c_make_encoder(None, object_dict, encode_basestring_ascii, None, ': ', ', ', True, False, True) if c_make_encoder else None
+
+
+def to_json(o) -> str:
+    if json_encoder is None:
+        return json.dumps(o, default=object_dict, sort_keys=True)
+    return ''.join(json_encoder(o, 0))
+
+
+class Listing:
+    __slots__ = ('symbol', 'product', 'denomination')
+
+    def __init__(self, symbol: Symbol, product: Product, denomination: Product):
+        self.symbol = symbol
+        self.product = product
+        self.denomination = denomination
+
+    @property
+    def __dict__(self):
+        return {'symbol': self.symbol, 'product': self.product, 'denomination': self.denomination}
+
+
+class Order:
+    __slots__ = ('symbol', 'price', 'quantity')
+
+    def __init__(self, symbol: Symbol, price: int, quantity: int) -> None:
+        self.symbol = symbol
+        self.price = price
+        self.quantity = quantity
+
+    @property
+    def __dict__(self):
+        return {'symbol': self.symbol, 'price': self.price, 'quantity': self.quantity}
+
+    def __str__(self) -> str:
+        return "(" + self.symbol + ", " + str(self.price) + ", " + str(self.quantity) + ")"
+
+    def __repr__(self) -> str:
+        return "(" + self.symbol + ", " + str(self.price) + ", " + str(self.quantity) + ")"
+
+
+class Trade:
+    __slots__ = ('symbol', 'price', 'quantity', 'buyer', 'seller', 'timestamp')
+
+    def __init__(self, symbol: Symbol, price: int, quantity: int, buyer: UserId = None, seller: UserId = None, timestamp: int = 0) -> None:
+        self.symbol = symbol
+        self.price: int = price
+        self.quantity: int = quantity
+        self.buyer = buyer
+        self.seller = seller
+        self.timestamp = timestamp
+
+    @property
+    def __dict__(self):
+        return {'symbol': self.symbol, 'price': self.price, 'quantity': self.quantity,
+                'buyer': self.buyer, 'seller': self.seller, 'timestamp': self.timestamp}
+
+
+class TradingState:
+    __slots__ = ('timestamp', 'listings', 'order_depths', 'own_trades', 'market_trades', 'position', 'observations')
+
+    def __init__(self,
+                 timestamp: Time,
+                 listings: Dict[Symbol, Listing],
+                 order_depths: Dict[Symbol, OrderDepth],
+                 own_trades: Dict[Symbol, List[Trade]],
+                 market_trades: Dict[Symbol, List[Trade]],
+                 position: Dict[Product, Position],
+                 observations: Dict[Product, Observation]):
+        self.timestamp = timestamp
+        self.listings = listings
+        self.order_depths = order_depths
+        self.own_trades = own_trades
+        self.market_trades = market_trades
+        self.position = position
+        self.observations = observations
+
+    @property
+    def __dict__(self):
+        return {'timestamp': self.timestamp, 'listings': self.listings, 'order_depths': self.order_depths,
+                'own_trades': self.own_trades, 'market_trades': self.market_trades,
+                'position': self.position, 'observations': self.observations}
+
+    def toJSON(self):
+        return to_json(self)
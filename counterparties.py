@@ -0,0 +1,121 @@
+"""
+COUNTERPARTY INDEX
+Offline, per trader and symbol tables of the named trades with forward returns from the
+trader's side (tox_{t} of markouts), and their summary:
+    trades = trader_trades('hist_data/island-data-bottle-round-3', 3, 2, 'hist_data/island-data-bottle-round-5')
+    summary = trader_summary(trades)
+Online, CounterpartyTracker keeps every named trader's net flow and last action per symbol from
+the trades of each tick, so a trader reads any counterparty signal with dict lookups.
+Submissions are a single file, traders carry a copy of CounterpartyTracker.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from market_data import load_prices, load_trades
+from markouts import FUTURE_TIMES, SYMBOLS, markouts, trade_frame
+
+TRADER_NAMES = ['Peter', 'Mitch', 'Gary', 'Penelope', 'Omar',
+                'Camilla', 'Caesar', 'Giulia', 'Mabel', 'Charlie',
+                'Pablo', 'Olivia', 'Orson', 'Casey', 'George', 'Mya',
+                'Max', 'Paris', 'Gina', 'Olga']
+
+
+def trader_trades(data_dir: str, round: int, day: int, trades_dir=None, symbols: List[str] = SYMBOLS,
+                  horizons: List[int] = FUTURE_TIMES) -> pd.DataFrame:
+    """ One row per named side of every trade: trader, trader_side (1 bought, -1 sold) and
+    markouts from that side, sorted by trader, symbol and time
+    """
+    prices = load_prices(pd.read_csv(f"{data_dir}/prices_round_{round}_day_{day}.csv", sep=';'), float('inf'))
+    trades_path = f"{trades_dir or data_dir}/trades_round_{round}_day_{day}_wn.csv"
+    trades = trade_frame(load_trades(pd.read_csv(trades_path, sep=';'), float('inf')))
+    trades = trades[trades['symbol'].isin(symbols) & (trades['price'] > 0)]
+    sides = []
+    for column, side in [('buyer', 1), ('seller', -1)]:
+        named = trades[trades[column].notna()].copy()
+        named['trader'] = named[column]
+        named['trader_side'] = side
+        sides.append(named)
+    named = pd.concat(sides, ignore_index=True)
+    result = markouts(prices, named, named['trader_side'].to_numpy(), horizons)
+    result.insert(0, 'day', day)
+    return result.sort_values(['trader', 'symbol', 'timestamp'], kind='stable').reset_index(drop=True)
+
+
+def trader_summary(trades: pd.DataFrame, horizons: List[int] = None) -> pd.DataFrame:
+    """ Per (trader, symbol): trade count, bought/sold volume and for every horizon the volume
+    weighted tox and the share of trades that made money
+    """
+    horizons = horizons or [int(c[4:]) for c in trades.columns if c.startswith('tox_')]
+    volume = trades['quantity']
+    frame = pd.DataFrame({
+        'trader': trades['trader'],
+        'symbol': trades['symbol'],
+        'count': 1,
+        'buy_volume': volume.where(trades['trader_side'] > 0, 0),
+        'sell_volume': volume.where(trades['trader_side'] < 0, 0),
+        'volume': volume,
+    })
+    for t in horizons:
+        frame[f'pnl_{t}'] = trades[f'pnl_{t}']
+        frame[f'win_{t}'] = (trades[f'tox_{t}'] > 0).astype(np.int64)
+    summary = frame.groupby(['trader', 'symbol']).sum()
+    for t in horizons:
+        summary[f'tox_{t}'] = summary[f'pnl_{t}']/summary['volume']
+        summary[f'win_{t}'] = summary[f'win_{t}']/summary['count']
+    return summary
+
+
+class CounterpartyTracker:
+    """ Net flow and last action of every named trader per symbol, one update per tick:
+        counterparties.update(state)
+        counterparties.net_flow('Olivia', 'UKULELE')
+    Own trades are counted once, the backtester hands the last fills to every tick until new ones.
+    tick_side is the side of the trader's first trade this tick (market trades before own
+    trades, buyer before seller), stale own trades included.
+    """
+    def __init__(self):
+        self.net: Dict[Tuple[str, str], int] = {}
+        self.trades: Dict[Tuple[str, str], int] = {}
+        self.last: Dict[Tuple[str, str], Tuple[int, float, int, int]] = {}
+        self.tick_sides: Dict[Tuple[str, str], int] = {}
+        self.own_time: Dict[str, int] = {}
+
+    def update(self, state):
+        self.tick_sides = {}
+        for symbol, trades in state.market_trades.items():
+            for trade in trades:
+                self.add(symbol, trade, True)
+        for symbol, trades in state.own_trades.items():
+            last_time = self.own_time.get(symbol, -1)
+            for trade in trades:
+                self.add(symbol, trade, trade.timestamp > last_time)
+                self.own_time[symbol] = max(self.own_time.get(symbol, -1), trade.timestamp)
+
+    def add(self, symbol: str, trade, new: bool):
+        for trader, side in [(trade.buyer, 1), (trade.seller, -1)]:
+            if not isinstance(trader, str) or not trader:
+                continue
+            key = (trader, symbol)
+            if key not in self.tick_sides:
+                self.tick_sides[key] = side
+            if new:
+                self.net[key] = self.net.get(key, 0) + side*trade.quantity
+                self.trades[key] = self.trades.get(key, 0) + 1
+                self.last[key] = (side, trade.price, trade.quantity, trade.timestamp)
+
+    def net_flow(self, trader: str, symbol: str) -> int:
+        return self.net.get((trader, symbol), 0)
+
+    def trade_count(self, trader: str, symbol: str) -> int:
+        return self.trades.get((trader, symbol), 0)
+
+    def last_action(self, trader: str, symbol: str):
+        """ (side, price, quantity, timestamp) of the trader's last trade in symbol, None if none yet
+        """
+        return self.last.get((trader, symbol))
+
+    def tick_side(self, trader: str, symbol: str) -> int:
+        return self.tick_sides.get((trader, symbol), 0)
@@ -36,6 +36,36 @@ class OrderDepth:
         self.sell_orders: Dict[int, int] = {}
 
 
+class SortedOrderDepth(OrderDepth):
+    """
+    OrderDepth that also keeps its levels as price/size vectors sorted best first
+    (bid_prices descending, ask_prices ascending, ask_sizes positive) with the best bid/ask cached.
+    buy_orders/sell_orders are the usual exchange dicts, the vectors live in slots so they
+    never show up in toJSON. The vectors are built once, treat the book as read only.
+    """
+    __slots__ = ('bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes', 'best_bid', 'best_ask')
+
+    def __init__(self, buy_orders: Dict[int, int], sell_orders: Dict[int, int]):
+        self.buy_orders = buy_orders
+        self.sell_orders = sell_orders
+        bids = list(buy_orders)
+        for i in range(1, len(bids)):
+            if bids[i-1] < bids[i]:
+                bids.sort(reverse=True)
+                break
+        asks = list(sell_orders)
+        for i in range(1, len(asks)):
+            if asks[i-1] > asks[i]:
+                asks.sort()
+                break
+        self.bid_prices: List[int] = bids
+        self.bid_sizes: List[int] = [buy_orders[bid] for bid in bids]
+        self.ask_prices: List[int] = asks
+        self.ask_sizes: List[int] = [abs(sell_orders[ask]) for ask in asks]
+        self.best_bid = bids[0] if bids else None
+        self.best_ask = asks[0] if asks else None
+
+
 class Trade:
     def __init__(self, symbol: Symbol, price: int, quantity: int, buyer: UserId = None, seller: UserId = None, timestamp: int = 0) -> None:
         self.symbol = symbol
@@ -0,0 +1,156 @@
+import math
+from collections import deque
+from typing import Dict, List
+
+"""
+ROLLING FEATURES
+The same quote features computed two ways:
+- quote_features: vectorized over a whole history with pandas, for the notebooks
+- FeatureEngine: incrementally with O(1) work per tick, for Trader.run
+The incremental part only uses the standard library so it can be pasted into a submission.
+
+Definitions (t is a window in ticks, p an EMA period):
+    mid_price        (bid + ask)/2
+    weighted_mid     (bid_sz*bid + ask_sz*ask)/(bid_sz + ask_sz), quote_wgt_px_top in the notebooks
+    imbalance        bid_sz/(bid_sz + ask_sz), quote_imb in the notebooks
+    mid_mavg{t}      mean of the last t mids, rolling(t, min_periods=1).mean()
+    mid_std{t}       sample std (ddof=1) of the last t mids, NaN until there are 2
+    mid_zscore{t}    (mid - mid_mavg{t})/mid_std{t}, 0 while the std is 0 or NaN
+    mid_ema{p}       EMA with alpha 1/p seeded with the first mid, same as ema_calculate
+"""
+
+MOVING_WINDOW_TIMES = [5, 10, 25, 50]
+EMA_PERIODS = [50]
+# Stds below this (relative to the price) count as 0, the incremental and pandas rounding differ there
+MIN_STD = 1e-9
+
+
+def weighted_mid(bid, bid_sz, ask, ask_sz):
+    return (bid_sz*bid + ask_sz*ask)/(bid_sz + ask_sz)
+
+
+def imbalance(bid_sz, ask_sz):
+    return bid_sz/(bid_sz + ask_sz)
+
+
+class RollingWindow:
+    """ Mean and sample std of the last `window` values, updated in O(1) (Welford add/remove).
+    Values are kept relative to the first one and the sums are recomputed exactly every
+    `window` updates, so rounding does not build up over a day of prices around 10000.
+    """
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.offset = None
+        self.shifted_mean = 0.0
+        self.m2 = 0.0
+        self.updates = 0
+
+    def update(self, x: float):
+        if self.offset is None:
+            self.offset = x
+        x -= self.offset
+        self.values.append(x)
+        n = len(self.values)
+        d = x - self.shifted_mean
+        self.shifted_mean += d/n
+        self.m2 += d*(x - self.shifted_mean)
+        if n > self.window:
+            y = self.values.popleft()
+            n -= 1
+            d = y - self.shifted_mean
+            self.shifted_mean -= d/n
+            self.m2 -= d*(y - self.shifted_mean)
+        self.updates += 1
+        if self.updates % self.window == 0:
+            self.shifted_mean = sum(self.values)/n
+            self.m2 = sum((v - self.shifted_mean)**2 for v in self.values)
+
+    @property
+    def mean(self) -> float:
+        return self.shifted_mean + self.offset
+
+    @property
+    def std(self) -> float:
+        n = len(self.values)
+        if n < 2:
+            return math.nan
+        return math.sqrt(max(self.m2, 0.0)/(n - 1))
+
+    def zscore(self, x: float) -> float:
+        std = self.std
+        if not std > MIN_STD*(abs(self.mean) + 1):
+            return 0.0
+        return (x - self.mean)/std
+
+
+class Ema:
+    def __init__(self, period: float):
+        self.alpha = 1/period
+        self.value = None
+
+    def update(self, x: float) -> float:
+        self.value = x if self.value is None else x*self.alpha + self.value*(1 - self.alpha)
+        return self.value
+
+
+class FeatureEngine:
+    """ Incremental quote features per symbol, one update per tick:
+        engine = FeatureEngine()
+        features = engine.update('BANANAS', bid, bid_sz, ask, ask_sz)
+    """
+    def __init__(self, windows: List[int] = MOVING_WINDOW_TIMES, ema_periods: List[int] = EMA_PERIODS):
+        self.windows = list(windows)
+        self.ema_periods = list(ema_periods)
+        self.rolling: Dict[str, List[RollingWindow]] = {}
+        self.emas: Dict[str, List[Ema]] = {}
+        self.last: Dict[str, dict] = {}
+
+    def update(self, symbol: str, bid: float, bid_sz: float, ask: float, ask_sz: float) -> dict:
+        if symbol not in self.rolling:
+            self.rolling[symbol] = [RollingWindow(t) for t in self.windows]
+            self.emas[symbol] = [Ema(p) for p in self.ema_periods]
+        mid = (bid + ask)/2
+        features = {
+            'mid_price': mid,
+            'weighted_mid': weighted_mid(bid, bid_sz, ask, ask_sz),
+            'imbalance': imbalance(bid_sz, ask_sz),
+        }
+        for t, rolling in zip(self.windows, self.rolling[symbol]):
+            rolling.update(mid)
+            features[f'mid_mavg{t}'] = rolling.mean
+            features[f'mid_std{t}'] = rolling.std
+            features[f'mid_zscore{t}'] = rolling.zscore(mid)
+        for p, ema in zip(self.ema_periods, self.emas[symbol]):
+            features[f'mid_ema{p}'] = ema.update(mid)
+        self.last[symbol] = features
+        return features
+
+
+def quote_features(md, windows: List[int] = MOVING_WINDOW_TIMES, ema_periods: List[int] = EMA_PERIODS):
+    """ Vectorized FeatureEngine over a quote frame with bid, bid_sz, ask, ask_sz (and symbol if
+    several symbols are mixed, each is computed on its own rows in time order). Returns a new frame
+    with the feature columns on the index of md.
+    """
+    import numpy as np
+    import pandas as pd
+
+    groups = md.groupby('symbol', sort=False) if 'symbol' in md.columns else [(None, md)]
+    frames = []
+    for _, quote in groups:
+        mid = (quote['bid'] + quote['ask'])/2
+        features = pd.DataFrame({
+            'mid_price': mid,
+            'weighted_mid': weighted_mid(quote['bid'], quote['bid_sz'], quote['ask'], quote['ask_sz']),
+            'imbalance': imbalance(quote['bid_sz'], quote['ask_sz']),
+        }, index=quote.index)
+        for t in windows:
+            rolling = mid.rolling(t, min_periods=1)
+            mean, std = rolling.mean(), rolling.std()
+            features[f'mid_mavg{t}'] = mean
+            features[f'mid_std{t}'] = std
+            features[f'mid_zscore{t}'] = np.where(std > MIN_STD*(mean.abs() + 1), (mid - mean)/std, 0.0)
+        for p in ema_periods:
+            features[f'mid_ema{p}'] = mid.ewm(alpha=1/p, adjust=False).mean()
+        frames.append(features)
+    return pd.concat(frames).loc[md.index]
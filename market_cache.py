@@ -0,0 +1,87 @@
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from market_data import PriceColumns, TradeColumns
+
+"""
+SHARED MEMORY MARKET DATA
+The parent parses every (round, day) once and copies its columns into one shared memory
+block per day. Workers get a small picklable handle and build PriceColumns/TradeColumns
+as ndarray views on the block, nothing is copied or re-parsed.
+"""
+
+ALIGNMENT = 64
+
+# Blocks attached in this process, kept referenced so the views stay valid
+attached_blocks: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def pack_layout(arrays: Dict[str, np.ndarray]):
+    """ Byte offset of every array inside one block, aligned to ALIGNMENT
+    """
+    layout, offset = {}, 0
+    for name, arr in arrays.items():
+        layout[name] = (offset, arr.dtype.str, arr.shape)
+        offset += -(-arr.nbytes // ALIGNMENT)*ALIGNMENT
+    return layout, max(offset, 1)
+
+
+def array_views(buf, layout) -> Dict[str, np.ndarray]:
+    arrays = {}
+    for name, (offset, dtype, shape) in layout.items():
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=buf, offset=offset)
+    return arrays
+
+
+class SharedMarketData:
+    """ Owner of the shared memory blocks, use as a context manager so blocks are unlinked
+    """
+    def __init__(self):
+        self.blocks: List[shared_memory.SharedMemory] = []
+        self.handles: Dict[Tuple[int, int], dict] = {}
+
+    def publish(self, key, prices: PriceColumns, trades: TradeColumns) -> dict:
+        price_arrays, price_meta = prices.to_arrays()
+        trade_arrays, trade_meta = trades.to_arrays()
+        arrays = {f'prices.{k}': v for k, v in price_arrays.items()}
+        arrays.update({f'trades.{k}': v for k, v in trade_arrays.items()})
+
+        layout, size = pack_layout(arrays)
+        block = shared_memory.SharedMemory(create=True, size=size)
+        self.blocks.append(block)
+        for name, view in array_views(block.buf, layout).items():
+            view[...] = arrays[name]
+
+        handle = {'name': block.name, 'layout': layout, 'prices': price_meta, 'trades': trade_meta}
+        self.handles[key] = handle
+        return handle
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+        self.handles = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def attach(handle: dict) -> Tuple[PriceColumns, TradeColumns]:
+    """ Zero copy PriceColumns/TradeColumns on top of a published block
+    """
+    block = attached_blocks.get(handle['name'])
+    if block is None:
+        block = shared_memory.SharedMemory(name=handle['name'])
+        attached_blocks[handle['name']] = block
+    arrays = array_views(block.buf, handle['layout'])
+    for arr in arrays.values():
+        arr.flags.writeable = False
+    price_arrays = {k.split('.', 1)[1]: v for k, v in arrays.items() if k.startswith('prices.')}
+    trade_arrays = {k.split('.', 1)[1]: v for k, v in arrays.items() if k.startswith('trades.')}
+    return PriceColumns.from_arrays(price_arrays, handle['prices']), TradeColumns.from_arrays(trade_arrays, handle['trades'])
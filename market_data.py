@@ -0,0 +1,268 @@
+from typing import Dict, Iterator, List
+from datamodel import *
+from compact_datamodel import Listing, Order, Trade, TradingState
+
+import numpy as np
+import pandas as pd
+
+PRICE_LEVELS = 3
+BID_PRICE_COLUMNS = [f"bid_price_{i}" for i in range(1, PRICE_LEVELS+1)]
+BID_VOLUME_COLUMNS = [f"bid_volume_{i}" for i in range(1, PRICE_LEVELS+1)]
+ASK_PRICE_COLUMNS = [f"ask_price_{i}" for i in range(1, PRICE_LEVELS+1)]
+ASK_VOLUME_COLUMNS = [f"ask_volume_{i}" for i in range(1, PRICE_LEVELS+1)]
+
+
+class PriceColumns:
+    """ Columnar copy of a prices_round_N_day_M.csv file
+
+    Rows are kept in file order and grouped by timestamp, rows of tick i live in
+    [row_offsets[i], row_offsets[i+1]). Missing levels are NaN prices with 0 volume.
+    int_levels[side, level] remembers if pandas parsed that price column as integers
+    (no gaps in the file), so book keys keep the same type as the csv.
+    TradingState/OrderDepth objects are only built when a tick is requested.
+    """
+    def __init__(self, timestamps, row_offsets, products, product_codes, bid_px, bid_sz, ask_px, ask_sz, mid_price, int_levels):
+        self.timestamps: np.ndarray = timestamps
+        self.row_offsets: np.ndarray = row_offsets
+        self.products: List[Product] = products
+        self.product_codes: np.ndarray = product_codes
+        self.bid_px: np.ndarray = bid_px
+        self.bid_sz: np.ndarray = bid_sz
+        self.ask_px: np.ndarray = ask_px
+        self.ask_sz: np.ndarray = ask_sz
+        self.mid_price: np.ndarray = mid_price
+        self.int_levels: np.ndarray = int_levels
+
+    ARRAYS = ['timestamps', 'row_offsets', 'product_codes', 'bid_px', 'bid_sz', 'ask_px', 'ask_sz', 'mid_price', 'int_levels']
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def to_arrays(self):
+        """ (arrays, meta) split of the columns, arrays are plain ndarrays and meta is picklable
+        """
+        return {name: getattr(self, name) for name in self.ARRAYS}, {'products': list(self.products)}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: dict) -> 'PriceColumns':
+        return cls(arrays['timestamps'], arrays['row_offsets'], meta['products'], arrays['product_codes'],
+                   arrays['bid_px'], arrays['bid_sz'], arrays['ask_px'], arrays['ask_sz'],
+                   arrays['mid_price'], arrays['int_levels'])
+
+    def truncate(self, time_limit: int) -> 'PriceColumns':
+        """ Ticks up to and including time_limit, as views on the same arrays
+        """
+        n = int(np.searchsorted(self.timestamps, time_limit, side="right"))
+        rows = int(self.row_offsets[n])
+        return PriceColumns(self.timestamps[:n], self.row_offsets[:n+1], self.products, self.product_codes[:rows],
+                            self.bid_px[:rows], self.bid_sz[:rows], self.ask_px[:rows], self.ask_sz[:rows],
+                            self.mid_price[:rows], self.int_levels)
+
+    def last_mid_prices(self) -> Dict[Product, float]:
+        """ Mid price of the last row of every product, used to mark positions at the end of a day
+        """
+        last_row = np.full(len(self.products), -1)
+        last_row[self.product_codes] = np.arange(len(self.product_codes))
+        return {self.products[c]: float(self.mid_price[r]) for c, r in enumerate(last_row.tolist()) if r >= 0}
+
+    def index_of(self, time: int) -> int:
+        """ Tick index of a timestamp, -1 if the timestamp is not in the file
+        """
+        i = int(np.searchsorted(self.timestamps, time))
+        if i < len(self.timestamps) and self.timestamps[i] == time:
+            return i
+        return -1
+
+    def state(self, i: int) -> TradingState:
+        """ Materialize the TradingState for tick i, same layout as the old iterrows loader
+        """
+        start, end = int(self.row_offsets[i]), int(self.row_offsets[i+1])
+        time = int(self.timestamps[i])
+        position: Dict[Product, Position] = {}
+        own_trades: Dict[Symbol, List[Trade]] = {}
+        market_trades: Dict[Symbol, List[Trade]] = {}
+        observations: Dict[Product, Observation] = {}
+        listings = {}
+        depths = {}
+
+        codes = self.product_codes[start:end].tolist()
+        bid_px = self.bid_px[start:end].tolist()
+        bid_sz = self.bid_sz[start:end].tolist()
+        ask_px = self.ask_px[start:end].tolist()
+        ask_sz = self.ask_sz[start:end].tolist()
+        mids = self.mid_price[start:end].tolist()
+        bid_int, ask_int = self.int_levels.tolist()
+        for r in range(end-start):
+            product = self.products[codes[r]]
+            listings[product] = Listing(product, product, product)
+            if bid_px[r][0] != bid_px[r][0]:
+                # NaN top of book, row is an observation (e.g. DOLPHIN_SIGHTINGS)
+                observations[product] = mids[r]
+                continue
+            buy_orders, sell_orders = {}, {}
+            for px, sz, is_int in zip(bid_px[r], bid_sz[r], bid_int):
+                if px > 0:
+                    buy_orders[int(px) if is_int else px] = sz
+            for px, sz, is_int in zip(ask_px[r], ask_sz[r], ask_int):
+                if px > 0:
+                    sell_orders[int(px) if is_int else px] = sz
+            depths[product] = SortedOrderDepth(buy_orders, sell_orders)
+
+            if product not in position:
+                position[product] = 0
+                own_trades[product] = []
+                market_trades[product] = []
+        return TradingState(time, listings, depths, own_trades, market_trades, position, observations)
+
+
+def load_prices(df_prices: pd.DataFrame, time_limit: int) -> PriceColumns:
+    """ Parse a prices data frame into PriceColumns in one vectorized pass
+    """
+    df_prices = df_prices[df_prices["timestamp"] <= time_limit]
+    times = df_prices["timestamp"].to_numpy(dtype=np.int64)
+    # Stable sort keeps the file order of products within a tick
+    order = np.argsort(times, kind="stable")
+    times = times[order]
+
+    codes, products = pd.factorize(df_prices["product"])
+    bid_px = df_prices[BID_PRICE_COLUMNS].to_numpy(dtype=np.float64)[order]
+    ask_px = df_prices[ASK_PRICE_COLUMNS].to_numpy(dtype=np.float64)[order]
+    bid_sz = np.nan_to_num(df_prices[BID_VOLUME_COLUMNS].to_numpy(dtype=np.float64)[order]).astype(np.int64)
+    ask_sz = np.nan_to_num(df_prices[ASK_VOLUME_COLUMNS].to_numpy(dtype=np.float64)[order]).astype(np.int64)
+    mid_price = df_prices["mid_price"].to_numpy(dtype=np.float64)[order]
+    int_levels = np.array([[pd.api.types.is_integer_dtype(df_prices[c]) for c in columns]
+                           for columns in (BID_PRICE_COLUMNS, ASK_PRICE_COLUMNS)])
+
+    tick_starts = np.flatnonzero(np.diff(times)) + 1
+    row_offsets = np.concatenate(([0], tick_starts, [len(times)])).astype(np.int64)
+    if len(times) == 0:
+        row_offsets = row_offsets[:1]
+    timestamps = times[row_offsets[:-1]]
+
+    return PriceColumns(timestamps, row_offsets, list(products), codes[order].astype(np.int32),
+                        bid_px, bid_sz, ask_px, ask_sz, mid_price, int_levels)
+
+
+class TradeColumns:
+    """ Columnar copy of a trades_round_N_day_M csv file
+
+    Rows are sorted by (timestamp, symbol) keeping file order inside a group. Group g
+    holds rows [group_offsets[g], group_offsets[g+1]) for one symbol at group_timestamps[g].
+    Buyers and sellers are codes into traders, -1 when the file has no name (_nn files).
+    """
+    def __init__(self, symbols, symbol_codes, price, quantity, traders, buyer_codes, seller_codes, group_offsets, group_timestamps, int_price):
+        self.symbols: List[Symbol] = symbols
+        self.symbol_codes: np.ndarray = symbol_codes
+        self.price: np.ndarray = price
+        self.quantity: np.ndarray = quantity
+        self.traders: List[UserId] = traders
+        self.buyer_codes: np.ndarray = buyer_codes
+        self.seller_codes: np.ndarray = seller_codes
+        self.group_offsets: np.ndarray = group_offsets
+        self.group_timestamps: np.ndarray = group_timestamps
+        self.int_price: bool = int_price
+
+    ARRAYS = ['symbol_codes', 'price', 'quantity', 'buyer_codes', 'seller_codes', 'group_offsets', 'group_timestamps']
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def to_arrays(self):
+        """ (arrays, meta) split of the columns, arrays are plain ndarrays and meta is picklable
+        """
+        meta = {'symbols': list(self.symbols), 'traders': list(self.traders), 'int_price': bool(self.int_price)}
+        return {name: getattr(self, name) for name in self.ARRAYS}, meta
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: dict) -> 'TradeColumns':
+        return cls(meta['symbols'], arrays['symbol_codes'], arrays['price'], arrays['quantity'], meta['traders'],
+                   arrays['buyer_codes'], arrays['seller_codes'], arrays['group_offsets'], arrays['group_timestamps'],
+                   meta['int_price'])
+
+    def truncate(self, time_limit: int) -> 'TradeColumns':
+        """ Trades up to and including time_limit, as views on the same arrays
+        """
+        g = int(np.searchsorted(self.group_timestamps, time_limit, side="right"))
+        rows = int(self.group_offsets[g])
+        return TradeColumns(self.symbols, self.symbol_codes[:rows], self.price[:rows], self.quantity[:rows], self.traders,
+                            self.buyer_codes[:rows], self.seller_codes[:rows], self.group_offsets[:g+1],
+                            self.group_timestamps[:g], self.int_price)
+
+    def names(self, codes: np.ndarray) -> List[UserId]:
+        traders = self.traders
+        return [traders[c] if c >= 0 else np.nan for c in codes.tolist()]
+
+    def tick_groups(self, timestamps: np.ndarray):
+        """ First and last+1 group of every tick in timestamps (sorted), so each tick's
+        trades can be sliced out directly. Trades at timestamps absent from the list are never referenced.
+        """
+        starts = np.searchsorted(self.group_timestamps, timestamps, side="left")
+        ends = np.searchsorted(self.group_timestamps, timestamps, side="right")
+        return starts, ends
+
+    def add_market_trades(self, market_trades: Dict[Symbol, List[Trade]], group_start: int, group_end: int):
+        """ Append the trades of groups [group_start, group_end) to a state's market_trades
+        """
+        for g in range(group_start, group_end):
+            start, end = int(self.group_offsets[g]), int(self.group_offsets[g+1])
+            time = int(self.group_timestamps[g])
+            symbol = self.symbols[self.symbol_codes[start]]
+            prices = self.price[start:end].tolist()
+            if self.int_price:
+                prices = [int(px) for px in prices]
+            trades = market_trades.setdefault(symbol, [])
+            trades.extend(map(Trade, [symbol]*(end-start), prices, self.quantity[start:end].tolist(),
+                              self.names(self.buyer_codes[start:end]), self.names(self.seller_codes[start:end]),
+                              [time]*(end-start)))
+
+
+def empty_trades() -> TradeColumns:
+    empty = np.zeros(0, dtype=np.int64)
+    return TradeColumns([], empty.astype(np.int32), empty.astype(np.float64), empty, [], empty.astype(np.int32),
+                        empty.astype(np.int32), np.zeros(1, dtype=np.int64), empty, False)
+
+
+def load_trades(df_trades: pd.DataFrame, time_limit: int) -> TradeColumns:
+    """ Parse a trades data frame into TradeColumns grouped by (timestamp, symbol)
+    """
+    if len(df_trades) == 0:
+        return empty_trades()
+    df_trades = df_trades[df_trades["timestamp"] <= time_limit]
+    times = df_trades["timestamp"].to_numpy(dtype=np.int64)
+    codes, symbols = pd.factorize(df_trades["symbol"])
+    order = np.lexsort((codes, times))
+    times = times[order]
+    codes = codes[order].astype(np.int32)
+
+    new_group = np.flatnonzero((np.diff(times) != 0) | (np.diff(codes) != 0)) + 1
+    group_offsets = np.concatenate(([0], new_group, [len(times)])).astype(np.int64)
+    if len(times) == 0:
+        group_offsets = group_offsets[:1]
+    # One name table for both sides, NaN names become -1
+    trader_codes, traders = pd.factorize(pd.concat([df_trades["buyer"], df_trades["seller"]], ignore_index=True))
+    buyer_codes = trader_codes[:len(df_trades)].astype(np.int32)[order]
+    seller_codes = trader_codes[len(df_trades):].astype(np.int32)[order]
+
+    return TradeColumns(list(symbols), codes,
+                        df_trades["price"].to_numpy(dtype=np.float64)[order],
+                        df_trades["quantity"].to_numpy(dtype=np.int64)[order],
+                        [str(t) for t in traders], buyer_codes, seller_codes,
+                        group_offsets, times[group_offsets[:-1]],
+                        pd.api.types.is_integer_dtype(df_trades["price"]))
+
+
+def stream_states(prices: PriceColumns, trades: TradeColumns = None, step: int = 1) -> Iterator[TradingState]:
+    """ Yield the TradingState of every step-th tick in order, building one state at a time.
+    Market trades after the previous state yielded, from skipped ticks or at timestamps missing
+    from the price file, are added to the next state yielded, for any step.
+    """
+    if trades is not None:
+        _, ends = trades.tick_groups(prices.timestamps)
+        ends = ends.tolist()
+        group_start = 0
+    for i in range(0, len(prices), step):
+        state = prices.state(i)
+        if trades is not None:
+            trades.add_market_trades(state.market_trades, group_start, ends[i])
+            group_start = ends[i]
+        yield state
@@ -0,0 +1,175 @@
+import glob
+import json
+import os
+import re
+import zipfile
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from market_data import (ASK_PRICE_COLUMNS, ASK_VOLUME_COLUMNS, BID_PRICE_COLUMNS, BID_VOLUME_COLUMNS,
+                         PriceColumns, TradeColumns, empty_trades, load_prices, load_trades)
+
+"""
+COLUMNAR STORE
+One folder per (round, day) under STORE_DIR holding one .npy file per column and a meta.json:
+    round_3_day_0/prices.<array>.npy         PriceColumns arrays (tick index by timestamp)
+    round_3_day_0/prices.product_rows.npy    rows grouped by product, product p owns
+    round_3_day_0/prices.product_offsets.npy product_rows[product_offsets[p]:product_offsets[p+1]]
+    round_3_day_0/trades_wn.<array>.npy      TradeColumns arrays, also trades_nn for unnamed files
+Files are read with mmap so loading a day only maps the pages that are touched.
+"""
+
+HIST_DATA_DIR = "./hist_data"
+STORE_DIR = "./hist_data/columnar"
+NO_TIME_LIMIT = 2**62
+
+FILE_REGEX = re.compile(r"(prices|trades)_round_(-?\d+)_day_(-?\d+)(?:_(wn|nn))?\.csv$")
+
+
+def day_dir(round: int, day: int, store_dir=STORE_DIR) -> str:
+    return f"{store_dir}/round_{round}_day_{day}"
+
+
+def save_columns(path: str, kind: str, columns, extra_arrays: Dict[str, np.ndarray] = None):
+    os.makedirs(path, exist_ok=True)
+    arrays, meta = columns.to_arrays()
+    arrays.update(extra_arrays or {})
+    for name, arr in arrays.items():
+        np.save(f"{path}/{kind}.{name}.npy", np.ascontiguousarray(arr))
+
+    meta_path = f"{path}/meta.json"
+    all_meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            all_meta = json.load(f)
+    all_meta[kind] = meta
+    with open(meta_path, "w") as f:
+        json.dump(all_meta, f)
+
+
+def load_arrays(path: str, kind: str, names: List[str], mmap=True) -> Dict[str, np.ndarray]:
+    return {name: np.load(f"{path}/{kind}.{name}.npy", mmap_mode="r" if mmap else None) for name in names}
+
+
+def product_index(prices: PriceColumns):
+    """ Row numbers grouped by product (time order kept) and the offsets of every product
+    """
+    product_rows = np.argsort(prices.product_codes, kind="stable")
+    counts = np.bincount(prices.product_codes, minlength=len(prices.products))
+    product_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    return product_rows.astype(np.int64), product_offsets
+
+
+def convert_archive(zip_path: str, store_dir=STORE_DIR) -> List[Tuple[str, int, int]]:
+    """ Convert every prices/trades csv inside one hist_data zip, no extraction needed
+    """
+    converted = []
+    with zipfile.ZipFile(zip_path) as archive:
+        for name in archive.namelist():
+            if name.startswith("__MACOSX"):
+                continue
+            match = FILE_REGEX.search(name)
+            if not match:
+                continue
+            file_type, round, day, names = match.group(1), int(match.group(2)), int(match.group(3)), match.group(4)
+            with archive.open(name) as f:
+                df = pd.read_csv(f, sep=";")
+            path = day_dir(round, day, store_dir)
+            if file_type == "prices":
+                prices = load_prices(df, NO_TIME_LIMIT)
+                product_rows, product_offsets = product_index(prices)
+                save_columns(path, "prices", prices, {"product_rows": product_rows, "product_offsets": product_offsets})
+                converted.append(("prices", round, day))
+            else:
+                save_columns(path, f"trades_{names or 'wn'}", load_trades(df, NO_TIME_LIMIT))
+                converted.append((f"trades_{names or 'wn'}", round, day))
+    return converted
+
+
+def convert_all(hist_data_dir=HIST_DATA_DIR, store_dir=STORE_DIR) -> List[Tuple[str, int, int]]:
+    converted = []
+    for zip_path in sorted(glob.glob(f"{hist_data_dir}/island-data-bottle-round-*.zip")):
+        converted += convert_archive(zip_path, store_dir)
+    return converted
+
+
+def has_day(round: int, day: int, store_dir=STORE_DIR) -> bool:
+    return os.path.exists(f"{day_dir(round, day, store_dir)}/prices.timestamps.npy")
+
+
+def read_meta(round: int, day: int, store_dir=STORE_DIR) -> dict:
+    with open(f"{day_dir(round, day, store_dir)}/meta.json") as f:
+        return json.load(f)
+
+
+def load_day(round: int, day: int, trades="wn", time_limit=None, store_dir=STORE_DIR) -> Tuple[PriceColumns, TradeColumns]:
+    """ Memory mapped PriceColumns/TradeColumns of one day, trades is "wn" or "nn"
+    """
+    path = day_dir(round, day, store_dir)
+    meta = read_meta(round, day, store_dir)
+    prices = PriceColumns.from_arrays(load_arrays(path, "prices", PriceColumns.ARRAYS), meta["prices"])
+    kind = f"trades_{trades}"
+    if kind in meta:
+        market_trades = TradeColumns.from_arrays(load_arrays(path, kind, TradeColumns.ARRAYS), meta[kind])
+    else:
+        market_trades = empty_trades()
+    if time_limit is not None:
+        prices, market_trades = prices.truncate(time_limit), market_trades.truncate(time_limit)
+    return prices, market_trades
+
+
+def prices_frame(round: int, days: List[int], product=None, store_dir=STORE_DIR) -> pd.DataFrame:
+    """ Prices in the csv layout (day;timestamp;product;levels;mid_price) for notebooks,
+    optionally only one product using the stored product index
+    """
+    frames = []
+    for day in days:
+        path = day_dir(round, day, store_dir)
+        meta = read_meta(round, day, store_dir)
+        prices = PriceColumns.from_arrays(load_arrays(path, "prices", PriceColumns.ARRAYS), meta["prices"])
+        tick_of_row = np.repeat(np.arange(len(prices.timestamps)), np.diff(prices.row_offsets))
+        rows = slice(None)
+        if product is not None:
+            index = load_arrays(path, "prices", ["product_rows", "product_offsets"])
+            p = prices.products.index(product)
+            rows = index["product_rows"][index["product_offsets"][p]:index["product_offsets"][p+1]]
+        frame = pd.DataFrame({
+            "day": day,
+            "timestamp": prices.timestamps[tick_of_row[rows]],
+            "product": np.asarray(prices.products, dtype=object)[prices.product_codes[rows]],
+        })
+        for i in range(len(BID_PRICE_COLUMNS)):
+            frame[BID_PRICE_COLUMNS[i]] = prices.bid_px[rows, i]
+            frame[BID_VOLUME_COLUMNS[i]] = np.where(np.isnan(prices.bid_px[rows, i]), np.nan, prices.bid_sz[rows, i])
+        for i in range(len(ASK_PRICE_COLUMNS)):
+            frame[ASK_PRICE_COLUMNS[i]] = prices.ask_px[rows, i]
+            frame[ASK_VOLUME_COLUMNS[i]] = np.where(np.isnan(prices.ask_px[rows, i]), np.nan, prices.ask_sz[rows, i])
+        frame["mid_price"] = prices.mid_price[rows]
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def trades_frame(round: int, days: List[int], trades="wn", store_dir=STORE_DIR) -> pd.DataFrame:
+    """ Trades in the csv layout (timestamp;buyer;seller;symbol;price;quantity) plus day, sorted by time and symbol
+    """
+    frames = []
+    for day in days:
+        _, market_trades = load_day(round, day, trades, store_dir=store_dir)
+        group_of_row = np.repeat(np.arange(len(market_trades.group_timestamps)), np.diff(market_trades.group_offsets))
+        frames.append(pd.DataFrame({
+            "day": day,
+            "timestamp": market_trades.group_timestamps[group_of_row],
+            "buyer": market_trades.names(market_trades.buyer_codes),
+            "seller": market_trades.names(market_trades.seller_codes),
+            "symbol": np.asarray(market_trades.symbols, dtype=object)[market_trades.symbol_codes],
+            "price": np.asarray(market_trades.price),
+            "quantity": np.asarray(market_trades.quantity),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    for kind, round, day in convert_all():
+        print(f"{kind} round {round} day {day}")
@@ -0,0 +1,127 @@
+import hashlib
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from market_data import PriceColumns, load_prices, load_trades
+
+FUTURE_TIMES = [1, 2, 3, 4, 5, 10, 25, 50, 100, 200, 500, 1000, 2000]
+SYMBOLS = ['BANANAS', 'COCONUTS', 'PINA_COLADAS', 'DIVING_GEAR', 'BERRIES', 'PICNIC_BASKET', 'DIP', 'BAGUETTE', 'UKULELE']
+CACHE_DIR = "./hist_data/markouts"
+
+"""
+MARKOUTS
+tox_{t} of CounterPartyAnalysis.ipynb for every trade of a day in one vectorized pass, all
+symbols at once: each trade is matched to the quote row of its symbol and timestamp with
+searchsorted and the mid t rows later (the last one past the end of the day) is gathered.
+    side       1 buyer lifted the ask, -1 seller hit the bid, 0 at the mid (market trades),
+               our side for own fills
+    tox_{t}    side*(mid t ticks later - price), positive when the side made money
+    pnl_{t}    quantity*tox_{t}
+    markouts = day_markouts('hist_data/island-data-bottle-round-3', 3, 2)
+Results of day_markouts are pickled in CACHE_DIR keyed by a hash of the input files.
+"""
+
+
+def quote_rows(prices: PriceColumns):
+    """ Rows of prices sorted by (product, timestamp), the (product, timestamp) key of each and
+    the end of its product's run, so row order[s + t] is t ticks after order[s]
+    """
+    row_times = np.repeat(prices.timestamps, np.diff(prices.row_offsets))
+    codes = prices.product_codes.astype(np.int64)
+    order = np.lexsort((row_times, codes))
+    keys = codes[order]*(int(row_times.max(initial=0)) + 1) + row_times[order]
+    ends = np.searchsorted(codes[order], codes[order], side='right')
+    return order, keys, ends, int(row_times.max(initial=0)) + 1
+
+
+def markouts(prices: PriceColumns, trades: pd.DataFrame, side=None, horizons: List[int] = FUTURE_TIMES) -> pd.DataFrame:
+    """ trades with timestamp, symbol, price, quantity columns (any others are kept) joined with
+    the quote of their tick and tox/pnl per horizon. side is one value per trade, the aggressor
+    guessed from the quote when None. Trades on ticks without a quote of their symbol are dropped.
+    """
+    order, keys, ends, stride = quote_rows(prices)
+    product_codes = {product: code for code, product in enumerate(prices.products)}
+    codes = trades['symbol'].map(product_codes).fillna(-1).to_numpy(dtype=np.int64)
+    trade_keys = codes*stride + trades['timestamp'].to_numpy(dtype=np.int64)
+    s = np.minimum(np.searchsorted(keys, trade_keys), len(keys) - 1)
+    known = (codes >= 0) & (keys[s] == trade_keys) if len(keys) else np.zeros(len(trades), dtype=bool)
+
+    result = trades.loc[known].reset_index(drop=True)
+    s = s[known]
+    rows = order[s]
+    price = result['price'].to_numpy(dtype=np.float64)
+    bid, ask = prices.bid_px[rows, 0], prices.ask_px[rows, 0]
+    mid = prices.mid_price[rows]
+    result['bid'] = bid
+    result['ask'] = ask
+    result['mid_price'] = mid
+    if side is None:
+        result['side'] = np.sign((price - bid) - (ask - price))
+    else:
+        result['side'] = np.asarray(side)[known]
+    side = result['side'].to_numpy(dtype=np.float64)
+    quantity = result['quantity'].to_numpy(dtype=np.float64)
+    columns = {}
+    for t in horizons:
+        future = prices.mid_price[order[np.minimum(s + t, ends[s] - 1)]]
+        columns[f'tox_{t}'] = side*(future - price)
+        columns[f'pnl_{t}'] = quantity*columns[f'tox_{t}']
+    return pd.concat([result, pd.DataFrame(columns)], axis=1)
+
+
+def own_markouts(prices: PriceColumns, own_trades: pd.DataFrame, horizons: List[int] = FUTURE_TIMES) -> pd.DataFrame:
+    """ Markouts of our fills (TradingLog.frames()['own_trades'] or the same columns), from our side
+    """
+    ours = own_trades['buyer'].astype(str).str.upper() == 'SUBMISSION'
+    return markouts(prices, own_trades, np.where(ours, 1, -1), horizons)
+
+
+def trade_frame(trades) -> pd.DataFrame:
+    """ TradeColumns as one row per market trade
+    """
+    groups = np.repeat(np.arange(len(trades.group_timestamps)), np.diff(trades.group_offsets))
+    return pd.DataFrame({
+        'timestamp': trades.group_timestamps[groups],
+        'symbol': [trades.symbols[c] for c in trades.symbol_codes.tolist()],
+        'price': trades.price,
+        'quantity': trades.quantity,
+        'buyer': trades.names(trades.buyer_codes),
+        'seller': trades.names(trades.seller_codes),
+    })
+
+
+def file_hash(*paths: str) -> str:
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def day_markouts(data_dir: str, round: int, day: int, symbols: List[str] = SYMBOLS,
+                 horizons: List[int] = FUTURE_TIMES, cache_dir=CACHE_DIR, trades_dir=None) -> pd.DataFrame:
+    """ Markouts of every market trade of symbols in a day of the csv files, cached on disk.
+    trades_dir is where the trades file is if not next to the prices, e.g. the round 5 folder
+    that has the trades of every day with the counterparty names
+    """
+    prices_path = f"{data_dir}/prices_round_{round}_day_{day}.csv"
+    trades_path = f"{trades_dir or data_dir}/trades_round_{round}_day_{day}_wn.csv"
+    key = file_hash(prices_path, trades_path)
+    digest = hashlib.sha1(repr((sorted(symbols), list(horizons))).encode()).hexdigest()[:12]
+    cache_path = f"{cache_dir}/markouts_{key}_{digest}.pkl"
+    if cache_dir and os.path.exists(cache_path):
+        return pd.read_pickle(cache_path)
+
+    prices = load_prices(pd.read_csv(prices_path, sep=';'), float('inf'))
+    trades = trade_frame(load_trades(pd.read_csv(trades_path, sep=';'), float('inf')))
+    trades = trades[trades['symbol'].isin(symbols) & (trades['price'] > 0)]
+    result = markouts(prices, trades, None, horizons)
+    result.insert(0, 'day', day)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        result.to_pickle(cache_path)
+    return result
@@ -19,12 +19,13 @@ def flatten_position(state: TradingState, product, orders: Dict[str, List[Order]
     pos = state.position[product]
     if pos == 0:
         return
+    order_depth = state.order_depths[product]
     if pos > 0:
-        px = max(state.order_depths[product].buy_orders.keys())
+        px = getattr(order_depth, 'best_bid', None) or max(order_depth.buy_orders.keys())
         pos = min(pos, 5)
     elif pos < 0:
         pos = max(pos, -5)
-        px = min(state.order_depths[product].sell_orders.keys())
+        px = getattr(order_depth, 'best_ask', None) or min(order_depth.sell_orders.keys())
     orders.append(Order(product, px, -pos))
 
     return
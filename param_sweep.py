@@ -0,0 +1,132 @@
+import contextlib
+import importlib
+import itertools
+import multiprocessing
+import os
+import random
+import time
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+import backtester
+from batch_backtest import LOG_DIR, day_data_dir, discover_days
+from market_cache import SharedMarketData, attach
+
+TRADER_MODULE = "trader_r5"
+
+"""
+Parameter names are module attributes of the trader, or "DICT.KEY" for an entry of a
+module level dict, e.g.
+    "PAIR_ENTRY": [1.0, 1.25, 1.5]
+    "MAX_POST_SIZE.COCONUTS": [39, 59, 79]
+"""
+EXAMPLE_GRID = {
+    "PAIR_ENTRY": [1.0, 1.25, 1.5],
+    "PAIR_EXIT": [0.0, 0.25, 0.5],
+    "PAIR_EMA_ALPHA": [1/25, 1/50, 1/100],
+    "MAX_POST_SIZE.COCONUTS": [39, 79],
+}
+
+# Per worker state, filled once by init_worker
+worker_days: Dict[Tuple[int, int], tuple] = {}
+worker_trader_module = None
+worker_step = 1
+
+
+def grid(space: Dict[str, list]) -> List[dict]:
+    """ Every combination of the values in space
+    """
+    names = list(space.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def random_search(space: Dict[str, list], n: int, seed=0) -> List[dict]:
+    """ n configurations drawn uniformly, values given as a list are sampled from,
+    (low, high) tuples are sampled uniformly (ints stay ints)
+    """
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    config[name] = rng.randint(low, high)
+                else:
+                    config[name] = rng.uniform(low, high)
+            else:
+                config[name] = rng.choice(values)
+        configs.append(config)
+    return configs
+
+
+def apply_params(module, params: dict):
+    for name, value in params.items():
+        attr, _, key = name.partition('.')
+        if key:
+            getattr(module, attr)[key] = value
+        else:
+            setattr(module, attr, value)
+
+
+def init_worker(handles: Dict[Tuple[int, int], dict], trader_module: str, step: int = 1):
+    """ Attach to the market data published by the parent, no csv parsing in the workers
+    """
+    global worker_trader_module, worker_step
+    worker_trader_module = importlib.import_module(trader_module)
+    worker_step = step
+    for key, handle in handles.items():
+        worker_days[key] = attach(handle)
+
+
+def run_config(job) -> dict:
+    """ Worker: backtest one configuration over every day and return its PnL
+    """
+    config_id, params = job
+    result = {'config_id': config_id, **params}
+    total_pnl = 0
+    start = time.time()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for (round, day), (prices, market_trades) in worker_days.items():
+            # Reload so hist_data and every constant start from the file defaults
+            module = importlib.reload(worker_trader_module)
+            apply_params(module, params)
+            summary = backtester.simulate_columns(round, day, module.Trader(), prices, market_trades, step=worker_step)
+            day_pnl = sum(summary['pnl'].values())
+            result[f'pnl_r{round}_d{day}'] = day_pnl
+            total_pnl += day_pnl
+    result['pnl'] = total_pnl
+    result['seconds'] = time.time() - start
+    return result
+
+
+def run_sweep(configs: List[dict], days: List[Tuple[int, int]], trader_module=TRADER_MODULE,
+              processes=None, time_limit=999900, step=1) -> pd.DataFrame:
+    """ Backtest every configuration over days on a process pool, ranked by total PnL.
+    step > 1 is a coarse sweep over every step-th tick, see backtester.simulate_columns
+    """
+    processes = processes or os.cpu_count()
+    jobs = list(enumerate(configs))
+    with SharedMarketData() as shared:
+        for round, day in days:
+            shared.publish((round, day), *backtester.load_day(round, day, time_limit, day_data_dir(round, day)))
+        with multiprocessing.Pool(processes, initializer=init_worker, initargs=(shared.handles, trader_module, step)) as pool:
+            results = list(pool.imap_unordered(run_config, jobs, chunksize=1))
+    results = pd.DataFrame(results).sort_values('pnl', ascending=False).reset_index(drop=True)
+    results.insert(0, 'rank', range(1, len(results)+1))
+    return results
+
+
+if __name__ == "__main__":
+    days = [d for d in discover_days() if d[0] == 3]
+    start = time.time()
+    results = run_sweep(grid(EXAMPLE_GRID), days)
+    elapsed = time.time() - start
+    # Throughput is bound by the replays, about 3s per config and day on one core at step 1
+    print(f"{len(results)} configs x {len(days)} days in {elapsed:.0f}s, "
+          f"{len(results)/elapsed*3600:.0f} configs/hour on {os.cpu_count()} cores")
+    os.makedirs(LOG_DIR, exist_ok=True)
+    results.to_csv(f"{LOG_DIR}/sweep_results.csv", index=False)
+    print(results.head(20).to_string())
@@ -0,0 +1,122 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+import backtester
+from batch_backtest import day_data_dir
+from market_data import PriceColumns, TradeColumns
+
+QUOTE_OFFSETS = [0, 1, 2, 3, 4]
+MARKOUT_TICKS = [1, 10, 100]
+
+"""
+COUNTERFACTUAL QUOTE FILLS
+Which passive quotes P0..P4 (floor(fair) - dx bids, ceil(fair) + dx asks, the ladder of
+mm_trades / passive_trades_general) would have been filled by each tick's market trades,
+for a whole day at once and without running the trader.
+    table = evaluate_day(3, 2, 'PINA_COLADAS')
+A quote is posted on a tick when mm_trades would post it (P0 may join the best level, P1..P4
+must improve it) and it does not cross. Fills follow the backtester's default rule: the quote
+must be inside the spread and is hit by market trades closer to the other side at or through its
+price, at its own price. Position limits and the trader's own aggressive orders are ignored,
+every offset is evaluated on its own. Markouts are per unit, mid h ticks later against the
+quote price (positive is good for both sides).
+"""
+
+
+def symbol_book(prices: PriceColumns, symbol: str) -> pd.DataFrame:
+    """ One row per tick of symbol: best bid/ask, mid and book_px, the size weighted price of
+    all levels (compute_book_alpha in the traders)
+    """
+    code = prices.products.index(symbol) if symbol in prices.products else -1
+    rows = np.flatnonzero(prices.product_codes == code)
+    row_ticks = np.searchsorted(prices.row_offsets, rows, side='right') - 1
+    bid_px, ask_px = prices.bid_px[rows], prices.ask_px[rows]
+    bid_sz, ask_sz = prices.bid_sz[rows], prices.ask_sz[rows]
+    notional = np.nansum(bid_px*bid_sz, axis=1) + np.nansum(ask_px*ask_sz, axis=1)
+    size = bid_sz.sum(axis=1) + ask_sz.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        book_px = notional/size
+    return pd.DataFrame({
+        'timestamp': prices.timestamps[row_ticks],
+        'bid': bid_px[:, 0],
+        'ask': ask_px[:, 0],
+        'mid': prices.mid_price[rows],
+        'book_px': book_px,
+    })
+
+
+def symbol_trades(trades: TradeColumns, symbol: str, book: pd.DataFrame) -> pd.DataFrame:
+    """ Market trades of symbol with the book row of their tick and the side that initiated them
+    (1 buyer lifting asks, -1 seller hitting bids, 0 at the mid), trades on ticks without a book
+    row are dropped like in the backtester
+    """
+    if symbol not in trades.symbols or len(book) == 0:
+        return pd.DataFrame({'tick': [], 'price': [], 'quantity': [], 'aggressor': []})
+    rows = np.flatnonzero(trades.symbol_codes == trades.symbols.index(symbol))
+    groups = np.searchsorted(trades.group_offsets, rows, side='right') - 1
+    times = trades.group_timestamps[groups]
+    book_times = book['timestamp'].to_numpy()
+    tick = np.minimum(np.searchsorted(book_times, times), len(book_times) - 1)
+    known = book_times[tick] == times
+    tick, price = tick[known], trades.price[rows][known]
+    bid, ask = book['bid'].to_numpy()[tick], book['ask'].to_numpy()[tick]
+    return pd.DataFrame({
+        'tick': tick,
+        'price': price,
+        'quantity': trades.quantity[rows][known],
+        'aggressor': np.sign((price - bid) - (ask - price)).astype(np.int64),
+    })
+
+
+def quote_fills(prices: PriceColumns, trades: TradeColumns, symbol: str, fair=None, offsets: List[int] = QUOTE_OFFSETS,
+                markouts: List[int] = MARKOUT_TICKS, size: int = None) -> pd.DataFrame:
+    """ Fill rate, volume, edge to fair and markouts per side and offset. fair is one price per
+    tick of symbol (book_px by default), size caps the fill of one quote (unlimited by default).
+    """
+    book = symbol_book(prices, symbol)
+    if len(book) == 0:
+        # No quotes of symbol in the day, nothing was quoted or filled
+        return pd.DataFrame(columns=['side', 'offset', 'quoted', 'fills', 'fill_rate', 'volume', 'edge'] + [f'markout_{h}' for h in markouts])
+    market = symbol_trades(trades, symbol, book)
+    n = len(book)
+    fair = book['book_px'].to_numpy() if fair is None else np.asarray(fair, dtype=np.float64)
+    bid, ask, mid = book['bid'].to_numpy(), book['ask'].to_numpy(), book['mid'].to_numpy()
+    tick, price, qty, aggressor = (market[c].to_numpy() for c in ['tick', 'price', 'quantity', 'aggressor'])
+    ahead = np.arange(n)
+
+    rows = []
+    for side, anchor in [(1, np.floor(fair)), (-1, np.ceil(fair))]:
+        # Our bids are hit by sellers at or below them, our asks lifted by buyers at or above them
+        hitting = aggressor == -side
+        touch, other = (bid, ask) if side > 0 else (ask, bid)
+        for dx in offsets:
+            px = anchor - side*dx
+            improves = side*(px - touch) > 0
+            quoted = (improves | ((dx == 0) & (px == touch))) & (side*(other - px) > 0)
+            hit = hitting & improves[tick] & quoted[tick] & (side*(px[tick] - price) >= 0)
+            volume = np.bincount(tick[hit], weights=qty[hit], minlength=n)
+            if size is not None:
+                volume = np.minimum(volume, size)
+            filled = volume > 0
+            row = {
+                'side': 'BUY' if side > 0 else 'SELL',
+                'offset': f'P{dx}',
+                'quoted': int(quoted.sum()),
+                'fills': int(filled.sum()),
+                'fill_rate': filled.sum()/max(quoted.sum(), 1),
+                'volume': volume.sum(),
+                'edge': np.average(side*(fair - px)[filled], weights=volume[filled]) if filled.any() else np.nan,
+            }
+            for h in markouts:
+                later = mid[np.minimum(ahead + h, n - 1)]
+                row[f'markout_{h}'] = np.average(side*(later - px)[filled], weights=volume[filled]) if filled.any() else np.nan
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def evaluate_day(round: int, day: int, symbol: str, fair=None, offsets: List[int] = QUOTE_OFFSETS,
+                 markouts: List[int] = MARKOUT_TICKS, size: int = None) -> pd.DataFrame:
+    prices, market_trades = backtester.load_day(round, day, data_dir=day_data_dir(round, day))
+    return quote_fills(prices, market_trades, symbol, fair, offsets, markouts, size)
@@ -0,0 +1,144 @@
+from collections import deque
+
+import numpy as np
+
+"""
+RING BUFFER STORE
+Fixed capacity history for trader globals. Values live in one preallocated numpy array and
+sum, mean, std, min and max of the values held are kept up to date on every append, so memory
+and per tick cost do not depend on how long the day is. Submissions are a single file, traders
+carry a copy of RingBuffer.
+"""
+
+
+class RingBuffer:
+    """ Last `capacity` values, oldest first. Sums are kept relative to the first value and
+    recomputed exactly every `capacity` appends, min/max use monotonic queues of positions.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.data = np.zeros(capacity)
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self.size = 0
+        self.offset = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min_queue = deque()
+        self.max_queue = deque()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, x: float):
+        if self.offset is None:
+            self.offset = x
+        if self.size == self.capacity:
+            y = self.data[self.count % self.capacity] - self.offset
+            self.total -= y
+            self.total_sq -= y*y
+        else:
+            self.size += 1
+        self.data[self.count % self.capacity] = x
+        self.count += 1
+        y = x - self.offset
+        self.total += y
+        self.total_sq += y*y
+
+        first = self.count - self.size
+        while self.min_queue and self.data[self.min_queue[-1] % self.capacity] >= x:
+            self.min_queue.pop()
+        self.min_queue.append(self.count - 1)
+        while self.min_queue[0] < first:
+            self.min_queue.popleft()
+        while self.max_queue and self.data[self.max_queue[-1] % self.capacity] <= x:
+            self.max_queue.pop()
+        self.max_queue.append(self.count - 1)
+        while self.max_queue[0] < first:
+            self.max_queue.popleft()
+
+        if self.count % self.capacity == 0:
+            # Exact sums around the current mean so rounding never builds up
+            values = self.values()
+            self.offset = float(values.mean())
+            shifted = values - self.offset
+            self.total = float(shifted.sum())
+            self.total_sq = float((shifted*shifted).sum())
+
+    def extend(self, values):
+        for x in values:
+            self.append(x)
+
+    def values(self) -> np.ndarray:
+        """ Copy of the values held, oldest first
+        """
+        return self.last(self.size)
+
+    def last(self, n: int) -> np.ndarray:
+        """ Copy of the newest n values, oldest first
+        """
+        n = min(n, self.size)
+        idx = np.arange(self.count - n, self.count) % self.capacity
+        return self.data[idx]
+
+    def oldest(self) -> float:
+        return self.data[(self.count - self.size) % self.capacity]
+
+    def newest(self) -> float:
+        return self.data[(self.count - 1) % self.capacity]
+
+    def popleft(self) -> float:
+        """ Drop and return the oldest value
+        """
+        x = self.oldest()
+        y = x - self.offset
+        self.total -= y
+        self.total_sq -= y*y
+        self.size -= 1
+        first = self.count - self.size
+        while self.min_queue and self.min_queue[0] < first:
+            self.min_queue.popleft()
+        while self.max_queue and self.max_queue[0] < first:
+            self.max_queue.popleft()
+        return float(x)
+
+    def keep_last(self, n: int):
+        """ Drop everything but the newest n values
+        """
+        if n < self.size:
+            values = self.last(n)
+            self.clear()
+            self.extend(values)
+
+    def sum(self) -> float:
+        return self.total + self.size*self.offset if self.size else 0.0
+
+    def mean(self) -> float:
+        """ nan when empty, like np.mean
+        """
+        if self.size == 0:
+            return float('nan')
+        return self.total/self.size + self.offset
+
+    def std(self, ddof=0) -> float:
+        """ Same default as np.std (population std), nan without more than ddof values
+        """
+        if self.size <= ddof:
+            return float('nan')
+        shifted_mean = self.total/self.size
+        var = (self.total_sq - self.size*shifted_mean*shifted_mean)/(self.size - ddof)
+        return float(np.sqrt(max(var, 0.0)))
+
+    def min(self, n: int = None) -> float:
+        """ Min of everything held in O(1), or of the newest n values
+        """
+        if n is not None and n < self.size:
+            return float(self.last(n).min())
+        return float(self.data[self.min_queue[0] % self.capacity])
+
+    def max(self, n: int = None) -> float:
+        if n is not None and n < self.size:
+            return float(self.last(n).max())
+        return float(self.data[self.max_queue[0] % self.capacity])
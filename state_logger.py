@@ -0,0 +1,91 @@
+"""
+STATE LOGGER
+Trader state logging, 'full' prints the whole state every tick, 'delta' prints a full state every
+keyframe_ticks ticks and only what changed in between as "<time> STATE_DELTA {...}"
+(trading_logs.py rebuilds the states):
+    state_logger = StateLogger()
+    state_logger.log(state, STATE_LOG_MODE, STATE_KEYFRAME_TICKS)
+Traders import it and build_submission.py inlines it into the single submission file.
+"""
+
+import json
+from typing import Dict
+
+from datamodel import TradingState
+from compact_datamodel import to_json
+
+
+def dict_delta(prev: dict, curr: dict) -> dict:
+    """ New or changed entries of curr, None for keys that are gone
+    """
+    delta = {k: v for k, v in curr.items() if k not in prev or prev[k] != v}
+    for k in prev:
+        if k not in curr:
+            delta[k] = None
+    return delta
+
+def state_snapshot(state: TradingState) -> dict:
+    """ Plain copy of everything toJSON prints, except the timestamp
+    """
+    return {
+        'listings': {sym: dict(vars(listing)) for sym, listing in state.listings.items()},
+        'market_trades': {sym: [dict(vars(t)) for t in trades] for sym, trades in state.market_trades.items()},
+        'observations': dict(state.observations),
+        'order_depths': {sym: (book_levels(depth.buy_orders), book_levels(depth.sell_orders)) for sym, depth in state.order_depths.items()},
+        'own_trades': {sym: [dict(vars(t)) for t in trades] for sym, trades in state.own_trades.items()},
+        'position': dict(state.position),
+    }
+
+def book_levels(orders: Dict[int, int]) -> dict:
+    # The price type is kept, an int price replacing an equal float price changes the json
+    return {px: (vol, type(px)) for px, vol in orders.items()}
+
+def levels_delta(prev: dict, curr: dict) -> list:
+    """ Flat [price, volume, ...] of new or changed levels, volume None for levels that are gone
+    """
+    delta = []
+    for px, level in curr.items():
+        if prev.get(px) != level:
+            delta += [px, level[0]]
+    for px in prev:
+        if px not in curr:
+            delta += [px, None]
+    return delta
+
+def state_delta(prev: dict, curr: dict) -> dict:
+    delta = {}
+    for field in ['listings', 'market_trades', 'observations', 'own_trades', 'position']:
+        changes = dict_delta(prev[field], curr[field])
+        if changes:
+            delta[field] = changes
+    depths = {}
+    for sym, (buys, sells) in curr['order_depths'].items():
+        prev_buys, prev_sells = prev['order_depths'].get(sym, ({}, {}))
+        changes = [levels_delta(prev_buys, buys), levels_delta(prev_sells, sells)]
+        if changes[0] or changes[1] or sym not in prev['order_depths']:
+            depths[sym] = changes
+    for sym in prev['order_depths']:
+        if sym not in curr['order_depths']:
+            depths[sym] = None
+    if depths:
+        delta['order_depths'] = depths
+    return delta
+
+class StateLogger:
+    """ mode and keyframe_ticks are passed on every call so traders can change them at any time
+    """
+    def __init__(self):
+        self.last = None
+        self.ticks = 0
+
+    def log(self, state: TradingState, mode: str = 'full', keyframe_ticks: int = 100):
+        if mode != 'delta':
+            print(f'\n{state.timestamp} {to_json(state)}')
+            return
+        snapshot = state_snapshot(state)
+        if self.last is None or self.ticks % keyframe_ticks == 0:
+            print(f'\n{state.timestamp} {to_json(state)}')
+        else:
+            print(f'\n{state.timestamp} STATE_DELTA {json.dumps(state_delta(self.last, snapshot), separators=(",", ":"))}')
+        self.last = snapshot
+        self.ticks += 1
@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from market_data import (ASK_PRICE_COLUMNS, ASK_VOLUME_COLUMNS, BID_PRICE_COLUMNS, BID_VOLUME_COLUMNS,
+                         load_prices, load_trades, stream_states)
+
+
+def price_frame(timestamps):
+    rows = []
+    for time in timestamps:
+        row = {'timestamp': time, 'product': 'PEARLS', 'mid_price': 10000.0}
+        for i, (bid_px, ask_px, bid_sz, ask_sz) in enumerate(zip(BID_PRICE_COLUMNS, ASK_PRICE_COLUMNS,
+                                                                  BID_VOLUME_COLUMNS, ASK_VOLUME_COLUMNS)):
+            row.update({bid_px: 9998 - i, ask_px: 10002 + i, bid_sz: 10, ask_sz: 10})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def trade_frame(timestamps):
+    return pd.DataFrame({'timestamp': timestamps, 'symbol': 'PEARLS', 'price': 10000, 'quantity': 1,
+                         'buyer': '', 'seller': ''})
+
+
+@pytest.mark.parametrize('step', [1, 2])
+def test_stream_states_keeps_orphan_trades(step):
+    # 150 and 350 are not in the price file, 50 is before its first tick and 700 after its last
+    prices = load_prices(price_frame([100, 200, 300, 400, 500]), 999900)
+    trades = load_trades(trade_frame([50, 100, 150, 200, 300, 350, 400, 500, 700]), 999900)
+
+    received = {state.timestamp: sorted(t.timestamp for t in state.market_trades.get('PEARLS', []))
+                for state in stream_states(prices, trades, step)}
+
+    if step == 1:
+        assert received == {100: [50, 100], 200: [150, 200], 300: [300], 400: [350, 400], 500: [500]}
+    else:
+        assert received == {100: [50, 100], 300: [150, 200, 300], 500: [350, 400, 500]}
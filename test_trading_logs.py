@@ -0,0 +1,58 @@
+import json
+import random
+
+from trading_logs import TradingLog, load_state, read_trading_logs
+
+SYMBOLS = ['PEARLS', 'BANANAS']
+
+
+def write_delta_log(path, ticks=60, keyframe_ticks=20, seed=0):
+    """ Log of full states every keyframe_ticks ticks and STATE_DELTA lines in between
+    """
+    rng = random.Random(seed)
+    lines = []
+    for tick in range(ticks):
+        time = tick*100
+        if tick % keyframe_ticks == 0:
+            state = {
+                'timestamp': time,
+                'listings': {sym: {'symbol': sym, 'product': sym, 'denomination': 'SEASHELLS'} for sym in SYMBOLS},
+                'order_depths': {sym: {'buy_orders': {str(9998 - i): rng.randint(1, 30) for i in range(2)},
+                                       'sell_orders': {str(10002 + i): -rng.randint(1, 30) for i in range(2)}}
+                                 for sym in SYMBOLS},
+                'market_trades': {},
+                'own_trades': {},
+                'position': {sym: rng.randint(-20, 20) for sym in SYMBOLS},
+                'observations': {},
+            }
+            lines.append(f"{time} {json.dumps(state)}")
+        else:
+            sym = rng.choice(SYMBOLS)
+            delta = {
+                'order_depths': {sym: [[9998 - rng.randint(0, 3), rng.choice([None, rng.randint(1, 30)])],
+                                       [10002 + rng.randint(0, 3), rng.choice([None, -rng.randint(1, 30)])]]},
+                'position': {sym: rng.randint(-20, 20)},
+            }
+            lines.append(f"{time} STATE_DELTA {json.dumps(delta)}")
+        lines.append(f"{time} SENT_ORDERS {json.dumps({sym: [] for sym in SYMBOLS})}")
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def test_states_range_matches_full_decode(tmp_path):
+    path = str(tmp_path / 'delta.log')
+    write_delta_log(path)
+    expected = {state['timestamp']: state for state in map(load_state, read_trading_logs(path)[0])}
+    log = TradingLog(path, cache=False)
+
+    # Collect the whole range first, so states handed out earlier must survive the later deltas
+    states = list(log.states(0, 3000))
+    assert [state['timestamp'] for state in states] == sorted(t for t in expected if t <= 3000)
+    for state in states:
+        want = expected[state['timestamp']]
+        for field in ['order_depths', 'position', 'market_trades', 'own_trades', 'observations']:
+            assert state[field] == want[field]
+
+    # A range starting between keyframes
+    for state in log.states(2500, 4500):
+        assert state['order_depths'] == expected[state['timestamp']]['order_depths']
@@ -0,0 +1,213 @@
+import contextlib
+import functools
+import heapq
+import importlib
+import inspect
+import os
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import backtester
+from batch_backtest import LOG_DIR, day_data_dir
+
+TRADER_MODULE = "trader_r5_mm"
+# Exchange limit on one Trader.run call
+TIME_BUDGET_MS = 900
+SLOWEST_TICKS = 20
+
+"""
+TICK PROFILER
+Times every function of a trader module on every tick of a backtest. The module level
+functions and the methods of the classes it defines are wrapped in place, so
+Trader.run -> alpha_trade_pair -> pair_mm_trade is recorded as a call stack without
+touching the trader file. Per tick it keeps the time spent in each function (all its calls
+that tick, children included) and the self time per call stack for the slowest ticks.
+    profiler = profile_day(3, 2)
+    profiler.report()                     # calls, p50/p99/max per function in microseconds
+    profiler.over_budget()                # ticks where Trader.run took longer than the budget
+    profiler.write_folded('slow.folded')  # flamegraph.pl / speedscope input
+The wrappers cost about a microsecond per call, which is included in the times.
+"""
+
+
+class TickProfiler:
+    """ Wraps the functions of a trader module and records their latency per tick
+    """
+    def __init__(self, module, budget_ms: float = TIME_BUDGET_MS, slowest: int = SLOWEST_TICKS):
+        self.module = module
+        self.budget_ns = budget_ms*1e6
+        self.slowest = slowest
+        self.timestamps: List[int] = []
+        self.tick_ns: Dict[str, List[int]] = {}
+        self.calls: Dict[str, int] = {}
+        # (run ns, timestamp, {stack: self ns}) of the slowest ticks, a min heap
+        self.slow_ticks: List[Tuple[int, int, Dict[Tuple[str, ...], int]]] = []
+        self.stack: List[str] = []
+        self.children: List[int] = []
+        self.tick = None
+        self.folded = None
+        self.originals = []
+
+    def instrument(self):
+        """ Replace the functions and methods defined in the module by timed wrappers
+        """
+        name = self.module.__name__
+        for attr, value in list(vars(self.module).items()):
+            if inspect.isfunction(value) and value.__module__ == name:
+                self.patch(self.module, attr, value, attr)
+            elif inspect.isclass(value) and value.__module__ == name:
+                for method, func in list(vars(value).items()):
+                    if inspect.isfunction(func) and not method.startswith('__'):
+                        self.patch(value, method, func, f'{attr}.{method}')
+        return self
+
+    def patch(self, owner, attr: str, func, label: str):
+        self.originals.append((owner, attr, func))
+        self.tick_ns[label] = []
+        self.calls[label] = 0
+        wrapper = self.timed_run(func, label) if label == 'Trader.run' else self.timed(func, label)
+        setattr(owner, attr, wrapper)
+
+    def restore(self):
+        for owner, attr, func in reversed(self.originals):
+            setattr(owner, attr, func)
+        self.originals = []
+
+    def timed(self, func, label: str):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if self.tick is None:
+                return func(*args, **kwargs)
+            self.stack.append(label)
+            self.children.append(0)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter_ns() - start
+                stack = tuple(self.stack)
+                self.stack.pop()
+                self_ns = elapsed - self.children.pop()
+                if self.children:
+                    self.children[-1] += elapsed
+                self.tick[label] = self.tick.get(label, 0) + elapsed
+                self.calls[label] += 1
+                self.folded[stack] = self.folded.get(stack, 0) + self_ns
+        return wrapper
+
+    def timed_run(self, func, label: str):
+        """ Trader.run opens and closes a tick
+        """
+        timed = self.timed(func, label)
+
+        @functools.wraps(func)
+        def wrapper(trader, state):
+            self.tick, self.folded = {}, {}
+            try:
+                return timed(trader, state)
+            finally:
+                self.end_tick(state.timestamp)
+        return wrapper
+
+    def end_tick(self, timestamp: int):
+        tick, folded = self.tick, self.folded
+        self.tick = self.folded = None
+        # Every function gets a value per tick (0 if not called) so the arrays line up with timestamps
+        self.timestamps.append(timestamp)
+        for label, values in self.tick_ns.items():
+            values.append(tick.get(label, 0))
+        entry = (tick.get('Trader.run', 0), timestamp, folded)
+        if len(self.slow_ticks) < self.slowest:
+            heapq.heappush(self.slow_ticks, entry)
+        elif entry[0] > self.slow_ticks[0][0]:
+            heapq.heapreplace(self.slow_ticks, entry)
+
+    def latencies(self) -> pd.DataFrame:
+        """ Nanoseconds per function per tick, indexed by timestamp
+        """
+        return pd.DataFrame(self.tick_ns, index=pd.Index(self.timestamps, name='timestamp'))
+
+    def report(self) -> pd.DataFrame:
+        """ Latency in microseconds per tick of every function that was called, over the ticks it ran
+        """
+        rows = []
+        for label, values in self.tick_ns.items():
+            values = np.asarray(values)
+            values = values[values > 0]
+            if not len(values):
+                continue
+            p50, p99 = np.percentile(values, [50, 99])/1e3
+            rows.append({
+                'function': label,
+                'calls': self.calls[label],
+                'ticks': len(values),
+                'mean_us': values.mean()/1e3,
+                'p50_us': p50,
+                'p99_us': p99,
+                'max_us': values.max()/1e3,
+                'total_ms': values.sum()/1e6,
+            })
+        report = pd.DataFrame(rows, columns=['function', 'calls', 'ticks', 'mean_us', 'p50_us', 'p99_us', 'max_us', 'total_ms'])
+        return report.sort_values('total_ms', ascending=False).reset_index(drop=True)
+
+    def histogram(self, label: str = 'Trader.run', bins: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """ Counts and log spaced bin edges (microseconds) of the per tick latency of one function
+        """
+        values = np.asarray(self.tick_ns[label])
+        values = values[values > 0]/1e3
+        edges = np.geomspace(values.min(), values.max(), bins + 1) if len(values) else np.array([0.0, 1.0])
+        counts, edges = np.histogram(values, edges)
+        return counts, edges
+
+    def over_budget(self) -> pd.DataFrame:
+        """ Ticks where Trader.run went over the budget, slowest first
+        """
+        run = np.asarray(self.tick_ns['Trader.run'])
+        over = np.flatnonzero(run > self.budget_ns)
+        flagged = pd.DataFrame({
+            'timestamp': np.asarray(self.timestamps, dtype=np.int64)[over],
+            'run_ms': run[over]/1e6,
+        })
+        return flagged.sort_values('run_ms', ascending=False).reset_index(drop=True)
+
+    def write_folded(self, path: str, per_tick=True):
+        """ Folded stacks of the slowest ticks ("frame;frame;frame microseconds" per line), the
+        input of flamegraph.pl and speedscope. With per_tick every tick is its own root frame.
+        """
+        lines = {}
+        for run_ns, timestamp, folded in sorted(self.slow_ticks, reverse=True):
+            for stack, self_ns in folded.items():
+                if per_tick:
+                    stack = (f'tick_{timestamp}',) + stack
+                lines[stack] = lines.get(stack, 0) + self_ns
+        with open(path, 'wt') as f:
+            for stack, self_ns in lines.items():
+                f.write(f"{';'.join(stack)} {max(self_ns//1000, 1)}\n")
+
+
+def profile_day(round: int, day: int, trader_module=TRADER_MODULE, budget_ms: float = TIME_BUDGET_MS,
+                slowest: int = SLOWEST_TICKS, log_path=os.devnull) -> TickProfiler:
+    """ Backtest one day with every function of the trader module timed, trader prints go to log_path
+    """
+    module = importlib.import_module(trader_module)
+    profiler = TickProfiler(module, budget_ms, slowest).instrument()
+    try:
+        with open(log_path, 'wt') as log, contextlib.redirect_stdout(log):
+            backtester.simulate_alternative(round, day, module.Trader(), data_dir=day_data_dir(round, day))
+    finally:
+        profiler.restore()
+    return profiler
+
+
+if __name__ == "__main__":
+    profiler = profile_day(3, 2)
+    print(profiler.report().to_string())
+    counts, edges = profiler.histogram()
+    for count, low, high in zip(counts, edges[:-1], edges[1:]):
+        print(f'{low:10.0f} - {high:10.0f} us {count:6d}')
+    print(f'{len(profiler.over_budget())} ticks over {TIME_BUDGET_MS} ms')
+    os.makedirs(LOG_DIR, exist_ok=True)
+    profiler.write_folded(f'{LOG_DIR}/slowest_ticks.folded')
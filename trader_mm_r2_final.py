@@ -1,6 +1,8 @@
 from typing import Dict, List
 from datamodel import OrderDepth, TradingState, Order
 import json
+from collections import deque
+from json.encoder import c_make_encoder, encode_basestring_ascii
 
 import numpy as np
 
@@ -25,26 +27,160 @@ PAIRS = {
     'PINA_COLADAS': 'COCONUTS'
 }
 
+# Copy of ring_buffer.RingBuffer, the submission is a single file
+class RingBuffer:
+    """ Last `capacity` values, oldest first. Sums are kept relative to the first value and
+    recomputed exactly every `capacity` appends, min/max use monotonic queues of positions.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.data = np.zeros(capacity)
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self.size = 0
+        self.offset = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min_queue = deque()
+        self.max_queue = deque()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, x: float):
+        if self.offset is None:
+            self.offset = x
+        if self.size == self.capacity:
+            y = self.data[self.count % self.capacity] - self.offset
+            self.total -= y
+            self.total_sq -= y*y
+        else:
+            self.size += 1
+        self.data[self.count % self.capacity] = x
+        self.count += 1
+        y = x - self.offset
+        self.total += y
+        self.total_sq += y*y
+
+        first = self.count - self.size
+        while self.min_queue and self.data[self.min_queue[-1] % self.capacity] >= x:
+            self.min_queue.pop()
+        self.min_queue.append(self.count - 1)
+        while self.min_queue[0] < first:
+            self.min_queue.popleft()
+        while self.max_queue and self.data[self.max_queue[-1] % self.capacity] <= x:
+            self.max_queue.pop()
+        self.max_queue.append(self.count - 1)
+        while self.max_queue[0] < first:
+            self.max_queue.popleft()
+
+        if self.count % self.capacity == 0:
+            # Exact sums around the current mean so rounding never builds up
+            values = self.values()
+            self.offset = float(values.mean())
+            shifted = values - self.offset
+            self.total = float(shifted.sum())
+            self.total_sq = float((shifted*shifted).sum())
+
+    def extend(self, values):
+        for x in values:
+            self.append(x)
+
+    def values(self) -> np.ndarray:
+        """ Copy of the values held, oldest first
+        """
+        return self.last(self.size)
+
+    def last(self, n: int) -> np.ndarray:
+        """ Copy of the newest n values, oldest first
+        """
+        n = min(n, self.size)
+        idx = np.arange(self.count - n, self.count) % self.capacity
+        return self.data[idx]
+
+    def oldest(self) -> float:
+        return self.data[(self.count - self.size) % self.capacity]
+
+    def newest(self) -> float:
+        return self.data[(self.count - 1) % self.capacity]
+
+    def popleft(self) -> float:
+        """ Drop and return the oldest value
+        """
+        x = self.oldest()
+        y = x - self.offset
+        self.total -= y
+        self.total_sq -= y*y
+        self.size -= 1
+        first = self.count - self.size
+        while self.min_queue and self.min_queue[0] < first:
+            self.min_queue.popleft()
+        while self.max_queue and self.max_queue[0] < first:
+            self.max_queue.popleft()
+        return float(x)
+
+    def keep_last(self, n: int):
+        """ Drop everything but the newest n values
+        """
+        if n < self.size:
+            values = self.last(n)
+            self.clear()
+            self.extend(values)
+
+    def sum(self) -> float:
+        return self.total + self.size*self.offset if self.size else 0.0
+
+    def mean(self) -> float:
+        """ nan when empty, like np.mean
+        """
+        if self.size == 0:
+            return float('nan')
+        return self.total/self.size + self.offset
+
+    def std(self, ddof=0) -> float:
+        """ Same default as np.std (population std), nan without more than ddof values
+        """
+        if self.size <= ddof:
+            return float('nan')
+        shifted_mean = self.total/self.size
+        var = (self.total_sq - self.size*shifted_mean*shifted_mean)/(self.size - ddof)
+        return float(np.sqrt(max(var, 0.0)))
+
+    def min(self, n: int = None) -> float:
+        """ Min of everything held in O(1), or of the newest n values
+        """
+        if n is not None and n < self.size:
+            return float(self.last(n).min())
+        return float(self.data[self.min_queue[0] % self.capacity])
+
+    def max(self, n: int = None) -> float:
+        if n is not None and n < self.size:
+            return float(self.last(n).max())
+        return float(self.data[self.max_queue[0] % self.capacity])
+
+
 def reset_state():
     print("HARD RESET OF GLOBAL VARIABLES OCCURED")
     global trader_state
     trader_state = {
-        'PAIR1': {'RAW_SIGNALS':[],
+        'PAIR1': {'RAW_SIGNALS': RingBuffer(100),
                 'EMA_1': 0,
                 'EMA_2': 0,
                 'LAST_TIME': 0,
-                'PAST_SIGNALS': [],
+                'PAST_SIGNALS': RingBuffer(20),
                 }
     }
     return
 
 
 trader_state = {
-    'PAIR1': {'RAW_SIGNALS':[],
+    'PAIR1': {'RAW_SIGNALS': RingBuffer(100),
               'EMA_1': 0,
               'EMA_2': 0,
               'LAST_TIME': 0,
-              'PAST_SIGNALS': [],
+              'PAST_SIGNALS': RingBuffer(20),
               }
 }
 
@@ -77,8 +213,19 @@ def update_state_trades(state):
                 trade.timestamp = time-100
     return
 
+# Copy of compact_datamodel.to_json, the submission is a single file
+def object_dict(o):
+    return o.__dict__
+
+json_encoder = c_make_encoder(None, object_dict, encode_basestring_ascii, None, ': ', ', ', True, False, True) if c_make_encoder else None
+
+def to_json(o) -> str:
+    if json_encoder is None:
+        return json.dumps(o, default=object_dict, sort_keys=True)
+    return ''.join(json_encoder(o, 0))
+
 def log_orders(timestamp, orders):
-    print("{} SENT_ORDERS {}".format(timestamp, json.dumps(orders, default=lambda o: o.__dict__, sort_keys=True)))
+    print("{} SENT_ORDERS {}".format(timestamp, to_json(orders)))
 
     return
 
@@ -359,26 +506,22 @@ def alpha_trade_pair1(state: TradingState):
     win1 = 20
     win2 = 100
     if len(trader_state['PAIR1']['RAW_SIGNALS']) < win1:
-        trader_state['PAIR1']['EMA_1'] = np.mean(trader_state['PAIR1']['RAW_SIGNALS'])
-        trader_state['PAIR1']['EMA_2'] = np.mean(trader_state['PAIR1']['RAW_SIGNALS'])
+        trader_state['PAIR1']['EMA_1'] = trader_state['PAIR1']['RAW_SIGNALS'].mean()
+        trader_state['PAIR1']['EMA_2'] = trader_state['PAIR1']['RAW_SIGNALS'].mean()
     elif len(trader_state['PAIR1']['RAW_SIGNALS']) < win2:
         trader_state['PAIR1']['EMA_1'] = ema_calculate(raw_signal,trader_state['PAIR1']['EMA_1'], 1/win1)
-        trader_state['PAIR1']['EMA_2'] = np.mean(trader_state['PAIR1']['RAW_SIGNALS'])
+        trader_state['PAIR1']['EMA_2'] = trader_state['PAIR1']['RAW_SIGNALS'].mean()
     else:
         trader_state['PAIR1']['EMA_1'] = ema_calculate(raw_signal,trader_state['PAIR1']['EMA_1'], 1/win1)
         trader_state['PAIR1']['EMA_2'] = ema_calculate(raw_signal,trader_state['PAIR1']['EMA_2'], 1/win2)
     if len(trader_state['PAIR1']['RAW_SIGNALS']) < 10:
         return [], []
-    if len(trader_state['PAIR1']['RAW_SIGNALS']) > 100:
-        trader_state['PAIR1']['RAW_SIGNALS'].pop(0)
     
-    signal_std = np.std(trader_state['PAIR1']['RAW_SIGNALS'])
+    signal_std = trader_state['PAIR1']['RAW_SIGNALS'].std()
     z_score = -1*(trader_state['PAIR1']['EMA_1']-trader_state['PAIR1']['EMA_2'])*20
 
     trader_state['PAIR1']['PAST_SIGNALS'].append(z_score)
-    if len(trader_state['PAIR1']['PAST_SIGNALS']) > 20:
-        trader_state['PAIR1']['PAST_SIGNALS'].pop(0)
-    past_zscore = trader_state['PAIR1']['PAST_SIGNALS'][0]
+    past_zscore = trader_state['PAIR1']['PAST_SIGNALS'].oldest()
     # print(f"ZSCORE {z_score:.3} {trader_state['PAIR1']['EMA_1']:.3} {trader_state['PAIR1']['EMA_2']:.3} {signal_std:.3}", end='')
     
     curr_pos1 = state.position.get(sym1, 0)
@@ -487,7 +630,7 @@ class Trader:
                 result['PINA_COLADAS'] = orders2
         
         update_state_trades(state)
-        print(f'\n{state.timestamp} {state.toJSON()}')
+        print(f'\n{state.timestamp} {to_json(state)}')
         if result:
             log_orders(state.timestamp, result)
 
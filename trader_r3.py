@@ -1,6 +1,8 @@
 from typing import Dict, List
 from datamodel import OrderDepth, TradingState, Order
 import json
+from collections import deque
+from json.encoder import c_make_encoder, encode_basestring_ascii
 
 import numpy as np
 
@@ -55,8 +57,19 @@ def update_state_trades(state):
                 trade.timestamp = time-100
     return
 
+# Copy of compact_datamodel.to_json, the submission is a single file
+def object_dict(o):
+    return o.__dict__
+
+json_encoder = c_make_encoder(None, object_dict, encode_basestring_ascii, None, ': ', ', ', True, False, True) if c_make_encoder else None
+
+def to_json(o) -> str:
+    if json_encoder is None:
+        return json.dumps(o, default=object_dict, sort_keys=True)
+    return ''.join(json_encoder(o, 0))
+
 def log_orders(timestamp, orders):
-    print("{} SENT_ORDERS {}".format(timestamp, json.dumps(orders, default=lambda o: o.__dict__, sort_keys=True)))
+    print("{} SENT_ORDERS {}".format(timestamp, to_json(orders)))
 
     return
 
@@ -229,6 +242,11 @@ def passive_trades_general(state: TradingState, product, orders: List[Order], fa
     return orders
 
 def get_bids_asks(order_depth):
+    if getattr(order_depth, 'bid_prices', None) is not None:
+        # SortedOrderDepth from the backtester, levels are already sorted
+        if len(order_depth.bid_prices) == 0 or len(order_depth.ask_prices) == 0:
+            return False, [], [], [], []
+        return True, list(order_depth.bid_prices), list(order_depth.ask_prices), list(order_depth.bid_sizes), list(order_depth.ask_sizes)
     if len(order_depth.buy_orders) != 0:
         bids = sorted(order_depth.buy_orders.keys(), reverse=True)
         bid_sizes = [order_depth.buy_orders[bid] for bid in bids]
@@ -438,8 +456,144 @@ def alpha_trade_pair1(state: TradingState):
 
     return orders1, orders2
 
+# Copy of ring_buffer.RingBuffer, the submission is a single file
+class RingBuffer:
+    """ Last `capacity` values, oldest first. Sums are kept relative to the first value and
+    recomputed exactly every `capacity` appends, min/max use monotonic queues of positions.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.data = np.zeros(capacity)
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self.size = 0
+        self.offset = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min_queue = deque()
+        self.max_queue = deque()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, x: float):
+        if self.offset is None:
+            self.offset = x
+        if self.size == self.capacity:
+            y = self.data[self.count % self.capacity] - self.offset
+            self.total -= y
+            self.total_sq -= y*y
+        else:
+            self.size += 1
+        self.data[self.count % self.capacity] = x
+        self.count += 1
+        y = x - self.offset
+        self.total += y
+        self.total_sq += y*y
+
+        first = self.count - self.size
+        while self.min_queue and self.data[self.min_queue[-1] % self.capacity] >= x:
+            self.min_queue.pop()
+        self.min_queue.append(self.count - 1)
+        while self.min_queue[0] < first:
+            self.min_queue.popleft()
+        while self.max_queue and self.data[self.max_queue[-1] % self.capacity] <= x:
+            self.max_queue.pop()
+        self.max_queue.append(self.count - 1)
+        while self.max_queue[0] < first:
+            self.max_queue.popleft()
+
+        if self.count % self.capacity == 0:
+            # Exact sums around the current mean so rounding never builds up
+            values = self.values()
+            self.offset = float(values.mean())
+            shifted = values - self.offset
+            self.total = float(shifted.sum())
+            self.total_sq = float((shifted*shifted).sum())
+
+    def extend(self, values):
+        for x in values:
+            self.append(x)
+
+    def values(self) -> np.ndarray:
+        """ Copy of the values held, oldest first
+        """
+        return self.last(self.size)
+
+    def last(self, n: int) -> np.ndarray:
+        """ Copy of the newest n values, oldest first
+        """
+        n = min(n, self.size)
+        idx = np.arange(self.count - n, self.count) % self.capacity
+        return self.data[idx]
+
+    def oldest(self) -> float:
+        return self.data[(self.count - self.size) % self.capacity]
+
+    def newest(self) -> float:
+        return self.data[(self.count - 1) % self.capacity]
+
+    def popleft(self) -> float:
+        """ Drop and return the oldest value
+        """
+        x = self.oldest()
+        y = x - self.offset
+        self.total -= y
+        self.total_sq -= y*y
+        self.size -= 1
+        first = self.count - self.size
+        while self.min_queue and self.min_queue[0] < first:
+            self.min_queue.popleft()
+        while self.max_queue and self.max_queue[0] < first:
+            self.max_queue.popleft()
+        return float(x)
+
+    def keep_last(self, n: int):
+        """ Drop everything but the newest n values
+        """
+        if n < self.size:
+            values = self.last(n)
+            self.clear()
+            self.extend(values)
+
+    def sum(self) -> float:
+        return self.total + self.size*self.offset if self.size else 0.0
+
+    def mean(self) -> float:
+        """ nan when empty, like np.mean
+        """
+        if self.size == 0:
+            return float('nan')
+        return self.total/self.size + self.offset
+
+    def std(self, ddof=0) -> float:
+        """ Same default as np.std (population std), nan without more than ddof values
+        """
+        if self.size <= ddof:
+            return float('nan')
+        shifted_mean = self.total/self.size
+        var = (self.total_sq - self.size*shifted_mean*shifted_mean)/(self.size - ddof)
+        return float(np.sqrt(max(var, 0.0)))
+
+    def min(self, n: int = None) -> float:
+        """ Min of everything held in O(1), or of the newest n values
+        """
+        if n is not None and n < self.size:
+            return float(self.last(n).min())
+        return float(self.data[self.min_queue[0] % self.capacity])
+
+    def max(self, n: int = None) -> float:
+        if n is not None and n < self.size:
+            return float(self.last(n).max())
+        return float(self.data[self.max_queue[0] % self.capacity])
+
+
 past_observations = {
-    'DOLPHINS': [],
+    # Trimmed to win3 of alpha_trade_diving_gear by one value per calculated tick, so it can
+    # run past win3 while sightings change on every tick (61 at most on round 3 days)
+    'DOLPHINS': RingBuffer(2*52),
 }
 
 ichimoku_cloud_lines = {
@@ -470,8 +624,8 @@ def alpha_trade_diving_gear(state: TradingState):
     win3 = 52
 
     global past_observations
-    if not past_observations['DOLPHINS']:
-        past_observations['DOLPHINS'] = [dolphins]*win2
+    if not len(past_observations['DOLPHINS']):
+        past_observations['DOLPHINS'].extend([dolphins]*win2)
         return []
 
     if curr_pos != 0:
@@ -500,9 +654,9 @@ def alpha_trade_diving_gear(state: TradingState):
                 orders.append(AlgoOrder('DIVING_GEAR', asks[0]+1, 'BUY', size, note=f'X0_DG_STOP_LOSS'))
 
             # Flush the indicator
-            past_observations['DOLPHINS'] = past_observations['DOLPHINS'][-win2:]
+            past_observations['DOLPHINS'].keep_last(win2)
 
-    if dolphins != past_observations['DOLPHINS'][-1]:
+    if dolphins != past_observations['DOLPHINS'].newest():
         past_observations['DOLPHINS'].append(dolphins)
         ignore_calc = True
 
@@ -510,12 +664,12 @@ def alpha_trade_diving_gear(state: TradingState):
         return orders
 
     if len(past_observations['DOLPHINS']) > win3:
-        past_observations['DOLPHINS'].pop(0)
-    
-    ichi_conversion = (max(past_observations['DOLPHINS'][-win1:])+min(past_observations['DOLPHINS'][-win1:]))/2
-    ichi_base = (max(past_observations['DOLPHINS'][-win2:])+min(past_observations['DOLPHINS'][-win2:]))/2
+        past_observations['DOLPHINS'].popleft()
+
+    ichi_conversion = (past_observations['DOLPHINS'].max(win1)+past_observations['DOLPHINS'].min(win1))/2
+    ichi_base = (past_observations['DOLPHINS'].max(win2)+past_observations['DOLPHINS'].min(win2))/2
     ichi_spanA = (ichi_base+ichi_conversion)/2
-    ichi_spanB = (max(past_observations['DOLPHINS'])+min(past_observations['DOLPHINS']))/2
+    ichi_spanB = (past_observations['DOLPHINS'].max()+past_observations['DOLPHINS'].min())/2
 
     lead = ichi_conversion-ichi_base
     cloud = ichi_spanA-ichi_spanB
@@ -651,7 +805,7 @@ class Trader:
                 result['BERRIES'] = orders
         
         update_state_trades(state)
-        print(f'\n{state.timestamp} {state.toJSON()}')
+        print(f'\n{state.timestamp} {to_json(state)}')
         if result:
             log_orders(state.timestamp, result)
 
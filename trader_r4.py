@@ -1,10 +1,13 @@
 from typing import Dict, List, Union
 from datamodel import OrderDepth, TradingState, Order
 import json
+from json.encoder import c_make_encoder, encode_basestring_ascii
 import math
 
 import numpy as np
 
+from state_logger import StateLogger
+
 POSITION_LIMITS = {
     "PEARLS": 20,
     "BANANAS": 20,
@@ -82,11 +85,29 @@ def update_state_trades(state):
                 trade.timestamp = time-100
     return
 
+# Copy of compact_datamodel.to_json, the submission is a single file
+def object_dict(o):
+    return o.__dict__
+
+json_encoder = c_make_encoder(None, object_dict, encode_basestring_ascii, None, ': ', ', ', True, False, True) if c_make_encoder else None
+
+def to_json(o) -> str:
+    if json_encoder is None:
+        return json.dumps(o, default=object_dict, sort_keys=True)
+    return ''.join(json_encoder(o, 0))
+
 def log_orders(timestamp, orders):
-    print("{} SENT_ORDERS {}".format(timestamp, json.dumps(orders, default=lambda o: o.__dict__, sort_keys=True)))
+    print("{} SENT_ORDERS {}".format(timestamp, to_json(orders)))
 
     return
 
+# 'full' prints the whole state every tick, 'delta' prints a full state every STATE_KEYFRAME_TICKS
+# ticks and only what changed in between as "<time> STATE_DELTA {...}" (state_logger.py, inlined by build_submission.py)
+STATE_LOG_MODE = 'full'
+STATE_KEYFRAME_TICKS = 100
+
+state_logger = StateLogger()
+
 def compute_fair_price(bids, bid_sizes, asks, ask_sizes) -> float:
     """ Compute size weighted price using orders in the state
     """
@@ -260,6 +281,11 @@ def passive_trades_general(state: TradingState, product, orders: List[Order], fa
     return orders
 
 def get_bids_asks(order_depth):
+    if getattr(order_depth, 'bid_prices', None) is not None:
+        # SortedOrderDepth from the backtester, levels are already sorted
+        if len(order_depth.bid_prices) == 0 or len(order_depth.ask_prices) == 0:
+            return False, [], [], [], []
+        return True, list(order_depth.bid_prices), list(order_depth.ask_prices), list(order_depth.bid_sizes), list(order_depth.ask_sizes)
     if len(order_depth.buy_orders) != 0:
         bids = sorted(order_depth.buy_orders.keys(), reverse=True)
         bid_sizes = [order_depth.buy_orders[bid] for bid in bids]
@@ -721,7 +747,7 @@ class Trader:
             alpha_trade_basket(state, result)
         
         update_state_trades(state)
-        print(f'\n{state.timestamp} {state.toJSON()}')
+        state_logger.log(state, STATE_LOG_MODE, STATE_KEYFRAME_TICKS)
         if result:
             log_orders(state.timestamp, result)
 
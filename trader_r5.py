@@ -1,10 +1,13 @@
-from typing import Dict, List, Union
+from typing import Dict, List, Tuple, Union
 from datamodel import OrderDepth, TradingState, Order
 import json
+from json.encoder import c_make_encoder, encode_basestring_ascii
 import math
 
 import numpy as np
 
+from state_logger import StateLogger
+
 POSITION_LIMITS = {
     "PEARLS": 20,
     "BANANAS": 20,
@@ -53,6 +56,18 @@ PAIR_WEIGHTS = [-1, 15/8]
 BASKET_COMPONENTS = ['PICNIC_BASKET','DIP','BAGUETTE','UKULELE']
 BASKET_WEIGHTS = [-1, 4, 2, 1]
 
+# Signal thresholds and EMA speed, module level so param_sweep can tune them
+PAIR_ENTRY = 1.25
+PAIR_EXIT = 0.25
+PAIR_EMA_ALPHA = 1/50
+BASKET_ENTRY = 1.25
+BASKET_EXIT = 0.25
+BASKET_EMA_ALPHA = 1/50
+# Enter on the spread priced at the depth of BASKET_ENTRY_SIZE baskets instead of the mids,
+# off until there is basket price data to backtest it on
+BASKET_DEPTH_ENTRY = False
+BASKET_ENTRY_SIZE = 5
+
 class AlgoOrder:
     def __init__(self, symbol: str, price: int, side: Union[int, str], quantity: int, note: str = 'None'):
         self.symbol = symbol
@@ -82,11 +97,29 @@ def update_state_trades(state):
                 trade.timestamp = time-100
     return
 
+# Copy of compact_datamodel.to_json, the submission is a single file
+def object_dict(o):
+    return o.__dict__
+
+json_encoder = c_make_encoder(None, object_dict, encode_basestring_ascii, None, ': ', ', ', True, False, True) if c_make_encoder else None
+
+def to_json(o) -> str:
+    if json_encoder is None:
+        return json.dumps(o, default=object_dict, sort_keys=True)
+    return ''.join(json_encoder(o, 0))
+
 def log_orders(timestamp, orders):
-    print("{} SENT_ORDERS {}".format(timestamp, json.dumps(orders, default=lambda o: o.__dict__, sort_keys=True)))
+    print("{} SENT_ORDERS {}".format(timestamp, to_json(orders)))
 
     return
 
+# 'full' prints the whole state every tick, 'delta' prints a full state every STATE_KEYFRAME_TICKS
+# ticks and only what changed in between as "<time> STATE_DELTA {...}" (state_logger.py, inlined by build_submission.py)
+STATE_LOG_MODE = 'full'
+STATE_KEYFRAME_TICKS = 100
+
+state_logger = StateLogger()
+
 def compute_fair_price(bids, bid_sizes, asks, ask_sizes) -> float:
     """ Compute size weighted price using orders in the state
     """
@@ -260,6 +293,11 @@ def passive_trades_general(state: TradingState, product, orders: List[Order], fa
     return orders
 
 def get_bids_asks(order_depth):
+    if getattr(order_depth, 'bid_prices', None) is not None:
+        # SortedOrderDepth from the backtester, levels are already sorted
+        if len(order_depth.bid_prices) == 0 or len(order_depth.ask_prices) == 0:
+            return False, [], [], [], []
+        return True, list(order_depth.bid_prices), list(order_depth.ask_prices), list(order_depth.bid_sizes), list(order_depth.ask_sizes)
     if len(order_depth.buy_orders) != 0:
         bids = sorted(order_depth.buy_orders.keys(), reverse=True)
         bid_sizes = [order_depth.buy_orders[bid] for bid in bids]
@@ -332,8 +370,8 @@ def get_pair_positions(px_signal, signal_ema, curr_pos):
     abs_signal = abs(px_signal)
     target_pos = curr_pos.copy()
     # Maximum position at 3
-    entry = 1.25
-    exit = 0.25
+    entry = PAIR_ENTRY
+    exit = PAIR_EXIT
 
     curr_rel_pos = [0,0]
     for i in range(2):
@@ -433,7 +471,7 @@ def alpha_trade_pair(state: TradingState, result_orders: Dict[str, List[Order]])
 
     global hist_data
     signal_ema2 = hist_data.get('PAIR_SIGNAL_EMA2', px_signal)
-    hist_data['PAIR_SIGNAL_EMA2'] = ema_calculate(px_signal, signal_ema2, 1/50)
+    hist_data['PAIR_SIGNAL_EMA2'] = ema_calculate(px_signal, signal_ema2, PAIR_EMA_ALPHA)
 
     target_pos, side = get_pair_positions(px_signal, signal_ema2,  curr_pos)
     
@@ -572,9 +610,110 @@ def alpha_trade_berries(state: TradingState):
     return orders
 
 
+# Copy of basket.BasketEngine, the submission is a single file
+def walk_depth(prices: Tuple, sizes: Tuple, qty: int):
+    """ Average price of trading qty through the levels in order, None if the book is too thin
+    """
+    left = qty
+    notional = 0
+    for px, sz in zip(prices, sizes):
+        take = min(sz, left)
+        notional += px*take
+        left -= take
+        if left == 0:
+            return notional/qty
+    return None
+
+
+class BasketEngine:
+    """ signal = (premium + sum(weight*price))/scale, positive when the basket (negative weight)
+    is cheap against the components. premium and scale are those of get_basket_signal.
+    ema_alpha=None skips the EMA for traders that do not use it.
+    """
+    def __init__(self, symbols: List[str], weights: List[float], premium: float = 400, scale: float = 100, ema_alpha: float = 1/50):
+        self.symbols = symbols
+        self.weights = weights
+        self.premium = premium
+        self.scale = scale
+        self.ema_alpha = ema_alpha
+        # symbol -> [buy_orders, sell_orders, bids, asks, bid_sizes, ask_sizes]
+        self.books: Dict[str, list] = {}
+        self.mids = [0.0]*len(symbols)
+        self.signal = None
+        self.ema = None
+        self.prev_ema = None
+
+    def update_book(self, symbol: str, order_depth) -> bool:
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = [None, None, (), (), (), ()]
+        if getattr(order_depth, 'bid_prices', None) is not None:
+            # SortedOrderDepth from the backtester, levels are already sorted
+            book[2:] = order_depth.bid_prices, order_depth.ask_prices, order_depth.bid_sizes, order_depth.ask_sizes
+            return len(book[2]) > 0 and len(book[3]) > 0
+        buy_orders, sell_orders = order_depth.buy_orders, order_depth.sell_orders
+        if buy_orders != book[0]:
+            book[0] = dict(buy_orders)
+            book[2] = tuple(sorted(buy_orders, reverse=True))
+            book[4] = tuple(buy_orders[px] for px in book[2])
+        if sell_orders != book[1]:
+            book[1] = dict(sell_orders)
+            book[3] = tuple(sorted(sell_orders))
+            book[5] = tuple(abs(sell_orders[px]) for px in book[3])
+        return len(book[2]) > 0 and len(book[3]) > 0
+
+    def update(self, state) -> bool:
+        """ Refresh the books, signal and EMA from the state, False if a book is missing or one sided
+        """
+        for i, symbol in enumerate(self.symbols):
+            order_depth = state.order_depths.get(symbol)
+            if order_depth is None or not self.update_book(symbol, order_depth):
+                return False
+            book = self.books[symbol]
+            self.mids[i] = (book[2][0] + book[3][0])/2
+        self.signal = self.value(self.mids)
+        if self.ema_alpha is not None:
+            # EMA of the previous ticks, seeded with the first signal, like hist_data in the traders
+            self.prev_ema = self.signal if self.ema is None else self.ema
+            self.ema = self.signal*self.ema_alpha + self.prev_ema*(1 - self.ema_alpha)
+        return True
+
+    def value(self, prices: List[float]) -> float:
+        total = self.premium
+        for w, px in zip(self.weights, prices):
+            total += w*px
+        return total/self.scale
+
+    def levels(self, symbol: str):
+        """ bids, asks, bid_sizes, ask_sizes as new lists, the same as get_bids_asks
+        """
+        book = self.books[symbol]
+        return list(book[2]), list(book[3]), list(book[4]), list(book[5])
+
+    def executable_signal(self, side: int, size: int):
+        """ Signal priced at the depth needed to trade size baskets, side 1 buying the basket and
+        selling the components, -1 the other way. None if a book is too thin.
+        """
+        prices = []
+        for symbol, w in zip(self.symbols, self.weights):
+            book = self.books[symbol]
+            qty = round(abs(w)*size)
+            if -side*w > 0:
+                px = walk_depth(book[3], book[5], qty)
+            else:
+                px = walk_depth(book[2], book[4], qty)
+            if px is None:
+                return None
+            prices.append(px)
+        return self.value(prices)
+
+
+basket = BasketEngine(BASKET_COMPONENTS, BASKET_WEIGHTS, ema_alpha=BASKET_EMA_ALPHA)
+
+
 def get_basket_signal(mids):
     """
-    # TODO: UPDATE TO USE BIDS/ASKS
+    From the mids, BasketEngine.executable_signal prices the same spread on the bids/asks
     postive signal means that basket is underpriced compared to components
     """
     px_diff = -400
@@ -586,18 +725,19 @@ def get_basket_signal(mids):
 
     return signal
 
-def get_basket_positions(px_signal, signal_ema, curr_pos):
+def get_basket_positions(px_signal, signal_ema, curr_pos, entry_signal=None):
     """
     Positive side means buy basket
     Positions will be returned as absolute values
+    entry_signal is the executable signal on the side of px_signal, entries use it when given
     """
     side = np.sign(px_signal)
-    abs_signal = abs(px_signal)
+    abs_signal = abs(px_signal) if entry_signal is None else side*entry_signal
     target_pos = curr_pos.copy()
 
     # Maximum position at 2
-    entry = 1.25
-    exit = 0.25
+    entry = BASKET_ENTRY
+    exit = BASKET_EXIT
 
     curr_rel_pos = [0,0,0,0]
     for i in range(4):
@@ -658,32 +798,26 @@ def get_basket_sym_trade(sym, curr_pos, target_pos, side, bids, asks, bid_szs, a
 def alpha_trade_basket(state: TradingState, result_orders: Dict[str, List[Order]]):
 
     # 0-BASKET, 1-DIP, 2-BAGUETTE, 3-UKULELE
-    bids, asks, bid_szs, ask_szs = [], [], [], []
-    curr_pos = []
-    for sym in BASKET_COMPONENTS:
-        valid, bidi, aski, bid_szi, ask_szi = get_bids_asks(state.order_depths[sym])
-        if not valid:
-            return
-        bids.append(bidi)
-        asks.append(aski)
-        bid_szs.append(bid_szi)
-        ask_szs.append(ask_szi)
-        curr_pos.append(state.position.get(sym, 0))
-        
-    mids = [0,0,0,0]
-    for i in range(4):
-        mids[i] = (bids[i][0] + asks[i][0])/2
-
-    px_signal = get_basket_signal(mids)
-    global hist_data
-    signal_ema = hist_data.get('BASKET_SIGNAL_EMA', px_signal)
-
-    hist_data['BASKET_SIGNAL_EMA'] = ema_calculate(px_signal, signal_ema, 1/50)
-
-    target_pos, side = get_basket_positions(px_signal, signal_ema,  curr_pos)
+    # Read at call time so a swept BASKET_EMA_ALPHA reaches the engine built at import
+    basket.ema_alpha = BASKET_EMA_ALPHA
+    if not basket.update(state):
+        return
+    curr_pos = [state.position.get(sym, 0) for sym in BASKET_COMPONENTS]
+
+    px_signal = basket.signal
+    signal_ema = basket.prev_ema
+    entry_signal = None
+    if BASKET_DEPTH_ENTRY:
+        entry_signal = basket.executable_signal(np.sign(px_signal), BASKET_ENTRY_SIZE)
+        if entry_signal is None:
+            # Not enough depth for the entry size, no new entries
+            entry_signal = 0
+
+    target_pos, side = get_basket_positions(px_signal, signal_ema, curr_pos, entry_signal)
     
     for i, sym in enumerate(BASKET_COMPONENTS):
-        trade = get_basket_sym_trade(sym, curr_pos[i], target_pos[i], -1*side*np.sign(BASKET_WEIGHTS[i]), bids[i], asks[i], bid_szs[i], ask_szs[i])
+        bids, asks, bid_szs, ask_szs = basket.levels(sym)
+        trade = get_basket_sym_trade(sym, curr_pos[i], target_pos[i], -1*side*np.sign(BASKET_WEIGHTS[i]), bids, asks, bid_szs, ask_szs)
         if trade:
             result_orders[sym] = [trade]
 
@@ -723,7 +857,7 @@ class Trader:
             alpha_trade_basket(state, result)
         
         update_state_trades(state)
-        print(f'\n{state.timestamp} {state.toJSON()}')
+        state_logger.log(state, STATE_LOG_MODE, STATE_KEYFRAME_TICKS)
         if result:
             log_orders(state.timestamp, result)
 
@@ -1,10 +1,13 @@
-from typing import Dict, List, Union
+from typing import Dict, List, Tuple, Union
 from datamodel import OrderDepth, TradingState, Order
 import json
+from json.encoder import c_make_encoder, encode_basestring_ascii
 import math
 
 import numpy as np
 
+from state_logger import StateLogger
+
 POSITION_LIMITS = {
     "PEARLS": 20,
     "BANANAS": 20,
@@ -68,29 +71,69 @@ hist_data = {
     # PAIR_SIGNAL
 }
 
+# Copy of counterparties.CounterpartyTracker, the submission is a single file
+class CounterpartyTracker:
+    """ Net flow and last action of every named trader per symbol, one update per tick:
+        counterparties.update(state)
+        counterparties.net_flow('Olivia', 'UKULELE')
+    Own trades are counted once, the backtester hands the last fills to every tick until new ones.
+    tick_side is the side of the trader's first trade this tick (market trades before own
+    trades, buyer before seller), stale own trades included.
+    """
+    def __init__(self):
+        self.net: Dict[Tuple[str, str], int] = {}
+        self.trades: Dict[Tuple[str, str], int] = {}
+        self.last: Dict[Tuple[str, str], Tuple[int, float, int, int]] = {}
+        self.tick_sides: Dict[Tuple[str, str], int] = {}
+        self.own_time: Dict[str, int] = {}
+
+    def update(self, state):
+        self.tick_sides = {}
+        for symbol, trades in state.market_trades.items():
+            for trade in trades:
+                self.add(symbol, trade, True)
+        for symbol, trades in state.own_trades.items():
+            last_time = self.own_time.get(symbol, -1)
+            for trade in trades:
+                self.add(symbol, trade, trade.timestamp > last_time)
+                self.own_time[symbol] = max(self.own_time.get(symbol, -1), trade.timestamp)
+
+    def add(self, symbol: str, trade, new: bool):
+        for trader, side in [(trade.buyer, 1), (trade.seller, -1)]:
+            if not isinstance(trader, str) or not trader:
+                continue
+            key = (trader, symbol)
+            if key not in self.tick_sides:
+                self.tick_sides[key] = side
+            if new:
+                self.net[key] = self.net.get(key, 0) + side*trade.quantity
+                self.trades[key] = self.trades.get(key, 0) + 1
+                self.last[key] = (side, trade.price, trade.quantity, trade.timestamp)
+
+    def net_flow(self, trader: str, symbol: str) -> int:
+        return self.net.get((trader, symbol), 0)
+
+    def trade_count(self, trader: str, symbol: str) -> int:
+        return self.trades.get((trader, symbol), 0)
+
+    def last_action(self, trader: str, symbol: str):
+        """ (side, price, quantity, timestamp) of the trader's last trade in symbol, None if none yet
+        """
+        return self.last.get((trader, symbol))
+
+    def tick_side(self, trader: str, symbol: str) -> int:
+        return self.tick_sides.get((trader, symbol), 0)
+
+
+counterparties = CounterpartyTracker()
+
 def check_olivia_trade(state, sym):
     global hist_data
-    market_trades = state.market_trades.get(sym, [])
-    for t in market_trades:
-        if t.buyer == 'Olivia':
-            hist_data[f'Olivia_{sym}'] = 3
-            hist_data[f'Olivia_{sym}_trades'] = hist_data.get(f'Olivia_{sym}_trades', 0) + 1
-            return 3
-        elif t.seller == 'Olivia':
-            hist_data[f'Olivia_{sym}_trades'] = hist_data.get(f'Olivia_{sym}_trades', 0) + 1
-            hist_data[f'Olivia_{sym}'] = -3
-            return -3
-    own_trades = state.own_trades.get(sym, [])
-    for t in own_trades:
-        if t.buyer == 'Olivia':
-            hist_data[f'Olivia_{sym}_trades'] = hist_data.get(f'Olivia_{sym}_trades', 0) + 1
-            hist_data[f'Olivia_{sym}'] = 3
-            return 3
-        elif t.seller == 'Olivia':
-            hist_data[f'Olivia_{sym}_trades'] = hist_data.get(f'Olivia_{sym}_trades', 0) + 1
-            hist_data[f'Olivia_{sym}'] = -3
-            return -3
-    return 0
+    side = counterparties.tick_side('Olivia', sym)
+    if side:
+        hist_data[f'Olivia_{sym}_trades'] = hist_data.get(f'Olivia_{sym}_trades', 0) + 1
+        hist_data[f'Olivia_{sym}'] = 3*side
+    return 3*side
 
 def get_olivia_position(sym):
     global hist_data
@@ -136,11 +179,29 @@ def update_state_trades(state):
                 trade.timestamp = time-100
     return
 
+# Copy of compact_datamodel.to_json, the submission is a single file
+def object_dict(o):
+    return o.__dict__
+
+json_encoder = c_make_encoder(None, object_dict, encode_basestring_ascii, None, ': ', ', ', True, False, True) if c_make_encoder else None
+
+def to_json(o) -> str:
+    if json_encoder is None:
+        return json.dumps(o, default=object_dict, sort_keys=True)
+    return ''.join(json_encoder(o, 0))
+
 def log_orders(timestamp, orders):
-    print("{} SENT_ORDERS {}".format(timestamp, json.dumps(orders, default=lambda o: o.__dict__, sort_keys=True)))
+    print("{} SENT_ORDERS {}".format(timestamp, to_json(orders)))
 
     return
 
+# 'full' prints the whole state every tick, 'delta' prints a full state every STATE_KEYFRAME_TICKS
+# ticks and only what changed in between as "<time> STATE_DELTA {...}" (state_logger.py, inlined by build_submission.py)
+STATE_LOG_MODE = 'full'
+STATE_KEYFRAME_TICKS = 100
+
+state_logger = StateLogger()
+
 def compute_book_alpha(bids, bid_sizes, asks, ask_sizes) -> float:
     """ Compute size weighted price using orders in the state
     """
@@ -167,6 +228,11 @@ def ema_calculate(new_entry, prev_ema, alpha):
     return new_entry*alpha+prev_ema*(1-alpha)
 
 def get_bids_asks(order_depth):
+    if getattr(order_depth, 'bid_prices', None) is not None:
+        # SortedOrderDepth from the backtester, levels are already sorted
+        if len(order_depth.bid_prices) == 0 or len(order_depth.ask_prices) == 0:
+            return False, [], [], [], []
+        return True, list(order_depth.bid_prices), list(order_depth.ask_prices), list(order_depth.bid_sizes), list(order_depth.ask_sizes)
     if len(order_depth.buy_orders) != 0:
         bids = sorted(order_depth.buy_orders.keys(), reverse=True)
         bid_sizes = [order_depth.buy_orders[bid] for bid in bids]
@@ -509,9 +575,110 @@ def alpha_trade_berries(state: TradingState):
     return orders
 
 
+# Copy of basket.BasketEngine, the submission is a single file
+def walk_depth(prices: Tuple, sizes: Tuple, qty: int):
+    """ Average price of trading qty through the levels in order, None if the book is too thin
+    """
+    left = qty
+    notional = 0
+    for px, sz in zip(prices, sizes):
+        take = min(sz, left)
+        notional += px*take
+        left -= take
+        if left == 0:
+            return notional/qty
+    return None
+
+
+class BasketEngine:
+    """ signal = (premium + sum(weight*price))/scale, positive when the basket (negative weight)
+    is cheap against the components. premium and scale are those of get_basket_signal.
+    ema_alpha=None skips the EMA for traders that do not use it.
+    """
+    def __init__(self, symbols: List[str], weights: List[float], premium: float = 400, scale: float = 100, ema_alpha: float = 1/50):
+        self.symbols = symbols
+        self.weights = weights
+        self.premium = premium
+        self.scale = scale
+        self.ema_alpha = ema_alpha
+        # symbol -> [buy_orders, sell_orders, bids, asks, bid_sizes, ask_sizes]
+        self.books: Dict[str, list] = {}
+        self.mids = [0.0]*len(symbols)
+        self.signal = None
+        self.ema = None
+        self.prev_ema = None
+
+    def update_book(self, symbol: str, order_depth) -> bool:
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = [None, None, (), (), (), ()]
+        if getattr(order_depth, 'bid_prices', None) is not None:
+            # SortedOrderDepth from the backtester, levels are already sorted
+            book[2:] = order_depth.bid_prices, order_depth.ask_prices, order_depth.bid_sizes, order_depth.ask_sizes
+            return len(book[2]) > 0 and len(book[3]) > 0
+        buy_orders, sell_orders = order_depth.buy_orders, order_depth.sell_orders
+        if buy_orders != book[0]:
+            book[0] = dict(buy_orders)
+            book[2] = tuple(sorted(buy_orders, reverse=True))
+            book[4] = tuple(buy_orders[px] for px in book[2])
+        if sell_orders != book[1]:
+            book[1] = dict(sell_orders)
+            book[3] = tuple(sorted(sell_orders))
+            book[5] = tuple(abs(sell_orders[px]) for px in book[3])
+        return len(book[2]) > 0 and len(book[3]) > 0
+
+    def update(self, state) -> bool:
+        """ Refresh the books, signal and EMA from the state, False if a book is missing or one sided
+        """
+        for i, symbol in enumerate(self.symbols):
+            order_depth = state.order_depths.get(symbol)
+            if order_depth is None or not self.update_book(symbol, order_depth):
+                return False
+            book = self.books[symbol]
+            self.mids[i] = (book[2][0] + book[3][0])/2
+        self.signal = self.value(self.mids)
+        if self.ema_alpha is not None:
+            # EMA of the previous ticks, seeded with the first signal, like hist_data in the traders
+            self.prev_ema = self.signal if self.ema is None else self.ema
+            self.ema = self.signal*self.ema_alpha + self.prev_ema*(1 - self.ema_alpha)
+        return True
+
+    def value(self, prices: List[float]) -> float:
+        total = self.premium
+        for w, px in zip(self.weights, prices):
+            total += w*px
+        return total/self.scale
+
+    def levels(self, symbol: str):
+        """ bids, asks, bid_sizes, ask_sizes as new lists, the same as get_bids_asks
+        """
+        book = self.books[symbol]
+        return list(book[2]), list(book[3]), list(book[4]), list(book[5])
+
+    def executable_signal(self, side: int, size: int):
+        """ Signal priced at the depth needed to trade size baskets, side 1 buying the basket and
+        selling the components, -1 the other way. None if a book is too thin.
+        """
+        prices = []
+        for symbol, w in zip(self.symbols, self.weights):
+            book = self.books[symbol]
+            qty = round(abs(w)*size)
+            if -side*w > 0:
+                px = walk_depth(book[3], book[5], qty)
+            else:
+                px = walk_depth(book[2], book[4], qty)
+            if px is None:
+                return None
+            prices.append(px)
+        return self.value(prices)
+
+
+basket = BasketEngine(BASKET_COMPONENTS, BASKET_WEIGHTS, ema_alpha=None)
+
+
 def get_basket_signal(mids):
     """
-    # TODO: UPDATE TO USE BIDS/ASKS
+    From the mids, BasketEngine.executable_signal prices the same spread on the bids/asks
     postive signal means that basket is underpriced compared to components
     """
     px_diff = -400
@@ -526,25 +693,14 @@ def get_basket_signal(mids):
 
 def alpha_trade_basket(state: TradingState, result_orders: Dict[str, List[Order]]):
     # 0-BASKET, 1-DIP, 2-BAGUETTE, 3-UKULELE
-    bids, asks, bid_szs, ask_szs = [], [], [], []
-    for sym in BASKET_COMPONENTS:
-        valid, bidi, aski, bid_szi, ask_szi = get_bids_asks(state.order_depths[sym])
-        if not valid:
-            return
-        bids.append(bidi)
-        asks.append(aski)
-        bid_szs.append(bid_szi)
-        ask_szs.append(ask_szi)
+    if not basket.update(state):
+        return
 
     sym = BASKET_COMPONENTS[0]
-    curr_pos = state.position.get(sym, 0)
-    mids = [0,0,0,0]
-    for i in range(4):
-        mids[i] = (bids[i][0] + asks[i][0])/2
+    bids, asks, bid_szs, ask_szs = basket.levels(sym)
+    px_signal = basket.signal
 
-    px_signal = get_basket_signal(mids)
-    
-    orders = basket_mm_trade(state, sym, bids[0], asks[0], bid_szs[0], ask_szs[0], px_signal*7)
+    orders = basket_mm_trade(state, sym, bids, asks, bid_szs, ask_szs, px_signal*7)
     if orders:
         result_orders[sym] = orders
 
@@ -629,6 +785,7 @@ class Trader:
         result = {}
         global hist_data
         print(f"State: {state.timestamp}")
+        counterparties.update(state)
 
         # For debugging loss of state
         # print(f"T={hist_data.get('last_time',0)}")
@@ -663,7 +820,7 @@ class Trader:
                     result[sym] = orders
         
         update_state_trades(state)
-        print(f'\n{state.timestamp} {state.toJSON()}')
+        state_logger.log(state, STATE_LOG_MODE, STATE_KEYFRAME_TICKS)
         if result:
             log_orders(state.timestamp, result)
 
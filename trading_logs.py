@@ -0,0 +1,339 @@
+import json
+import os
+import re
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+"""
+TRADER LOG DECODING
+Traders print "<time> {state json}" and, with STATE_LOG_MODE = 'delta', "<time> STATE_DELTA {delta json}"
+between full states. A delta only holds what changed since the previous tick:
+    listings, market_trades, own_trades, observations, position: {key: new value or null if gone}
+    order_depths: {sym: [[buy price, volume or null, ...], [sell price, volume or null, ...]] or null if gone}
+read_trading_logs rebuilds the full state json of every tick, the same text toJSON would have printed,
+so process_trading_state_jsons in the notebooks works on both kinds of log.
+
+TradingLog is the indexed reader: the first open scans the file once and caches the byte offset
+of every state/delta/SENT_ORDERS line in "<log>.index.npz", later opens only load the index.
+Single ticks and time ranges are read by seeking to the lines they need.
+"""
+
+STATE_REGEX = re.compile(r"(\d+) (\{.*\})$")
+DELTA_REGEX = re.compile(r"(\d+) STATE_DELTA (\{.*\})$")
+ORDERS_REGEX = re.compile(r"(\d+) SENT_ORDERS (\{.*\})")
+LINE_REGEX = re.compile(rb"(\d+) (STATE_DELTA |SENT_ORDERS )?\{")
+
+# Line kinds in the index
+STATE, DELTA, ORDERS = 0, 1, 2
+LINE_KINDS = {None: STATE, b"STATE_DELTA ": DELTA, b"SENT_ORDERS ": ORDERS}
+BOOK_LEVELS = 3
+INDEX_ARRAYS = ['times', 'kinds', 'offsets', 'lengths']
+
+
+def number_key(key: str):
+    """ Price level keys are ints or floats in the state, json turned them into strings
+    """
+    try:
+        return int(key)
+    except ValueError:
+        return float(key)
+
+
+def load_state(text: str) -> dict:
+    return numeric_levels(json.loads(text))
+
+
+def numeric_levels(state: dict) -> dict:
+    for depth in state['order_depths'].values():
+        for side in ['buy_orders', 'sell_orders']:
+            depth[side] = {number_key(px): vol for px, vol in depth[side].items()}
+    return state
+
+
+def state_text(state: dict) -> str:
+    return json.dumps(state, sort_keys=True)
+
+
+def apply_changes(target: dict, changes: dict):
+    for key, value in changes.items():
+        # Pop first so a changed key type (10000 replacing 10000.0) replaces the key as well
+        target.pop(key, None)
+        if value is not None:
+            target[key] = value
+
+
+def apply_delta(state: dict, time: int, delta: dict):
+    """ Move state (as returned by load_state) forward to time in place
+    """
+    state['timestamp'] = time
+    for field in ['listings', 'market_trades', 'observations', 'own_trades', 'position']:
+        apply_changes(state[field], delta.get(field, {}))
+    depths = state['order_depths']
+    for sym, sides in delta.get('order_depths', {}).items():
+        if sides is None:
+            depths.pop(sym, None)
+            continue
+        depth = depths.setdefault(sym, {'buy_orders': {}, 'sell_orders': {}})
+        for side, levels in zip(['buy_orders', 'sell_orders'], sides):
+            apply_changes(depth[side], dict(zip(levels[::2], levels[1::2])))
+
+
+def read_trading_logs(file) -> Tuple[List[str], List[dict]]:
+    """ State jsons (delta lines expanded to full states) and sent orders of a trader log
+    """
+    trading_states = []
+    sent_orders = []
+    state = None
+    with open(file, "r") as fp:
+        for l in fp:
+            match = STATE_REGEX.match(l)
+            if match:
+                trading_states.append(match.group(2))
+                state = None
+                continue
+            match = DELTA_REGEX.match(l)
+            if match:
+                if state is None:
+                    if not trading_states:
+                        # Log starts in the middle of a delta run, nothing to apply it to
+                        continue
+                    state = load_state(trading_states[-1])
+                apply_delta(state, int(match.group(1)), json.loads(match.group(2)))
+                trading_states.append(state_text(state))
+                continue
+            match = ORDERS_REGEX.match(l)
+            if match:
+                sent = json.loads(match.group(2))
+                sent['timestamp'] = int(match.group(1))
+                sent_orders.append(sent)
+                continue
+
+    return trading_states, sent_orders
+
+
+def build_index(path: str) -> dict:
+    """ Time, kind, json byte offset and json length of every state/delta/orders line
+    """
+    times, kinds, offsets, lengths = [], [], [], []
+    offset = 0
+    with open(path, "rb") as fp:
+        for line in fp:
+            match = LINE_REGEX.match(line)
+            if match:
+                start = match.end() - 1
+                times.append(int(match.group(1)))
+                kinds.append(LINE_KINDS[match.group(2)])
+                offsets.append(offset + start)
+                lengths.append(len(line.rstrip()) - start)
+            offset += len(line)
+    return {
+        'times': np.array(times, dtype=np.int64),
+        'kinds': np.array(kinds, dtype=np.int8),
+        'offsets': np.array(offsets, dtype=np.int64),
+        'lengths': np.array(lengths, dtype=np.int64),
+    }
+
+
+def copy_state(state: dict) -> dict:
+    """ Copy deep enough that apply_delta on the original leaves the copy alone
+    """
+    copied = {field: dict(state[field]) for field in ['listings', 'market_trades', 'observations', 'own_trades', 'position']}
+    copied['order_depths'] = {sym: {'buy_orders': dict(depth['buy_orders']), 'sell_orders': dict(depth['sell_orders'])}
+                              for sym, depth in state['order_depths'].items()}
+    copied['timestamp'] = state['timestamp']
+    return copied
+
+
+class TradingLog:
+    """ Indexed access to the states and sent orders of a trader or sandbox log
+    """
+    def __init__(self, path: str, cache=True):
+        self.path = path
+        index = self.load_index() if cache else None
+        if index is None:
+            index = build_index(path)
+            if cache:
+                self.save_index(index)
+        is_state = index['kinds'] != ORDERS
+        self.times = index['times'][is_state]
+        self.kinds = index['kinds'][is_state]
+        self.offsets = index['offsets'][is_state]
+        self.lengths = index['lengths'][is_state]
+        # Position of the full state every delta builds on, -1 before the first full state
+        full = np.where(self.kinds == STATE, np.arange(len(self.kinds)), -1)
+        self.keyframes = np.maximum.accumulate(full) if len(full) else full
+        is_orders = ~is_state
+        self.order_times = index['times'][is_orders]
+        self.order_offsets = index['offsets'][is_orders]
+        self.order_lengths = index['lengths'][is_orders]
+
+    @property
+    def index_path(self) -> str:
+        return f"{self.path}.index.npz"
+
+    def file_stamp(self) -> np.ndarray:
+        stat = os.stat(self.path)
+        return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+    def load_index(self):
+        """ Cached index, None if missing or the log changed since it was built
+        """
+        if not os.path.exists(self.index_path):
+            return None
+        with np.load(self.index_path) as cached:
+            if not np.array_equal(cached['stamp'], self.file_stamp()):
+                return None
+            return {name: cached[name] for name in INDEX_ARRAYS}
+
+    def save_index(self, index: dict):
+        try:
+            np.savez(self.index_path, stamp=self.file_stamp(), **index)
+        except OSError:
+            # Read only log folder, the index is rebuilt on the next open
+            pass
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def positions(self, start=None, end=None) -> np.ndarray:
+        """ Positions (in file order) of the states with start <= time <= end
+        """
+        mask = np.ones(len(self.times), dtype=bool)
+        if start is not None:
+            mask &= self.times >= start
+        if end is not None:
+            mask &= self.times <= end
+        return np.flatnonzero(mask)
+
+    def read_json(self, fp, offsets: np.ndarray, lengths: np.ndarray) -> Iterator:
+        """ Parsed json of every line, one read for the whole span between the first and last line
+        """
+        if len(offsets) == 0:
+            return
+        base = int(offsets[0])
+        fp.seek(base)
+        block = fp.read(int(offsets[-1] + lengths[-1]) - base)
+        for offset, length in zip((offsets - base).tolist(), lengths.tolist()):
+            yield json.loads(block[offset:offset+length])
+
+    def states(self, start=None, end=None) -> Iterator[dict]:
+        """ Full states with start <= time <= end, deltas are applied from the closest full state before
+        """
+        positions = self.positions(start, end)
+        if len(positions) == 0:
+            return
+        first, last = int(positions[0]), int(positions[-1])
+        # Deltas before the first full state have nothing to build on and are skipped
+        keyframe = int(self.keyframes[first])
+        if keyframe < 0:
+            keyframe = first
+        wanted = set(positions.tolist())
+        state = None
+        handed_out = False
+        with open(self.path, "rb") as fp:
+            span = slice(keyframe, last + 1)
+            lines = self.read_json(fp, self.offsets[span], self.lengths[span])
+            for i, kind, parsed in zip(range(keyframe, last + 1), self.kinds[span].tolist(), lines):
+                if kind == STATE:
+                    state = numeric_levels(parsed)
+                    handed_out = False
+                elif state is None:
+                    continue
+                else:
+                    if handed_out:
+                        # The caller holds the full state, the deltas after it go on a copy
+                        state = copy_state(state)
+                        handed_out = False
+                    apply_delta(state, int(self.times[i]), parsed)
+                if i in wanted:
+                    if kind == STATE:
+                        handed_out = True
+                        yield state
+                    else:
+                        yield copy_state(state)
+
+    def state(self, time: int) -> dict:
+        """ Full state at time, KeyError if the log has no state for it
+        """
+        for state in self.states(time, time):
+            return state
+        raise KeyError(time)
+
+    def sent_orders(self, start=None, end=None) -> List[dict]:
+        """ SENT_ORDERS of every tick with start <= time <= end, timestamp added like read_trading_logs
+        """
+        mask = np.ones(len(self.order_times), dtype=bool)
+        if start is not None:
+            mask &= self.order_times >= start
+        if end is not None:
+            mask &= self.order_times <= end
+        positions = np.flatnonzero(mask)
+        sent = []
+        with open(self.path, "rb") as fp:
+            for time, orders in zip(self.order_times[positions].tolist(),
+                                    self.read_json(fp, self.order_offsets[positions], self.order_lengths[positions])):
+                orders['timestamp'] = time
+                sent.append(orders)
+        return sent
+
+    def frames(self, start=None, end=None) -> dict:
+        """ DataFrames of the states with start <= time <= end, every column collected first and
+        each frame built once:
+            order_depths  timestamp, symbol, bid_levels, bid_1, bid_sz_1 .. 3, ask_levels, ask_1, ask_sz_1 .. 3
+            positions     timestamp, symbol, position
+            observations  timestamp, symbol, observation
+            market_trades/own_trades  trades printed with time-100 (new since the last tick)
+            sent_orders   timestamp, symbol and the order fields
+        """
+        book = {'timestamp': [], 'symbol': [], 'bid_levels': [], 'ask_levels': []}
+        for side in ['bid', 'ask']:
+            for i in range(1, BOOK_LEVELS+1):
+                book[f'{side}_{i}'] = []
+                book[f'{side}_sz_{i}'] = []
+        positions = {'timestamp': [], 'symbol': [], 'position': []}
+        observations = {'timestamp': [], 'symbol': [], 'observation': []}
+        market_trades, own_trades = [], []
+
+        for state in self.states(start, end):
+            time = state['timestamp']
+            for sym, depth in state['order_depths'].items():
+                book['timestamp'].append(time)
+                book['symbol'].append(sym)
+                bids = sorted(depth['buy_orders'], reverse=True)
+                asks = sorted(depth['sell_orders'])
+                book['bid_levels'].append(len(bids))
+                book['ask_levels'].append(len(asks))
+                for i in range(BOOK_LEVELS):
+                    book[f'bid_{i+1}'].append(float(bids[i]) if i < len(bids) else np.nan)
+                    book[f'bid_sz_{i+1}'].append(depth['buy_orders'][bids[i]] if i < len(bids) else np.nan)
+                    book[f'ask_{i+1}'].append(float(asks[i]) if i < len(asks) else np.nan)
+                    book[f'ask_sz_{i+1}'].append(abs(depth['sell_orders'][asks[i]]) if i < len(asks) else np.nan)
+            for sym, pos in state['position'].items():
+                positions['timestamp'].append(time)
+                positions['symbol'].append(sym)
+                positions['position'].append(pos)
+            for sym, obs in state['observations'].items():
+                observations['timestamp'].append(time)
+                observations['symbol'].append(sym)
+                observations['observation'].append(obs)
+            for trades, rows in [(state['market_trades'], market_trades), (state['own_trades'], own_trades)]:
+                for sym_trades in trades.values():
+                    rows.extend(t for t in sym_trades if t['timestamp'] == time-100)
+
+        sent_orders = []
+        for sent in self.sent_orders(start, end):
+            for sym, orders in sent.items():
+                if sym != 'timestamp':
+                    sent_orders.extend({'timestamp': sent['timestamp'], **order} for order in orders)
+
+        trade_columns = ['timestamp', 'symbol', 'price', 'quantity', 'buyer', 'seller']
+        return {
+            'order_depths': pd.DataFrame(book),
+            'positions': pd.DataFrame(positions),
+            'observations': pd.DataFrame(observations),
+            'market_trades': pd.DataFrame(market_trades, columns=trade_columns),
+            'own_trades': pd.DataFrame(own_trades, columns=trade_columns),
+            'sent_orders': pd.DataFrame(sent_orders) if sent_orders else pd.DataFrame(columns=['timestamp', 'symbol', 'price', 'quantity']),
+        }